@@ -2,9 +2,14 @@
 
 from __future__ import annotations
 
+import argparse
 import logging
+import multiprocessing
 import os
+import signal as signal_module
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
 from pathlib import Path
 
 import yaml
@@ -15,10 +20,22 @@ from strategies.ma_crossover import ma_crossover
 from strategies.rsi import rsi
 from strategies.support_resist import support_resist
 from strategies.volume_spike import volume_spike
+from utils import market_calendar
+from utils.broker_flow import ingest_broker_summary
 from utils.chart import generate_chart
+from utils.enrichment import enrich_signal
 from utils.fetch_data import fetch_data
 from utils.gsheets import log_signal
-from utils.telegram import send_signal
+from utils.haka_power import ingest_running_trade
+from utils import alerts, cache, cassette, job_queue, source_health
+from utils.news_sentiment import fetch_corporate_action, refresh_sentiment
+from utils.pipeline import Pipeline, Stage
+from utils import portfolio_risk
+from utils.positions import open_positions, poll_positions
+from utils.profiling import SymbolProfile, profile_section, profile_stage
+from utils.resample import get_timeframe
+from utils.subscribers import Subscriber, job_plan, recipients, subscribers_for
+from utils.telegram import send_digest, send_signal
 from utils.watchlist import generate_watchlist
 
 load_dotenv()
@@ -36,58 +53,405 @@ def load_config() -> dict:
 		return yaml.safe_load(handle) or {}
 
 
-def run_strategies(symbol: str, config: dict) -> list[dict]:
-	data = fetch_data(symbol, config)
-	if not data:
-		logger.warning("Tidak ada data untuk %s, melewati strategi.", symbol)
-		return []
+cassette.install(load_config())
+
+_ACTIVE_PIPELINES: set[Pipeline] = set()
 
+
+def evaluate_strategies(data: dict, config: dict) -> list[tuple[str, dict]]:
+	"""Jalankan strategi aktif pada data satu simbol; hasil berupa (nama strategi, sinyal)."""
 	signals = []
+	strategy_params = config.get("strategy_params", {})
 	for strategy in config.get("strategies", []):
+		timeframe = (strategy_params.get(strategy) or {}).get("timeframe")
+		strategy_data = {**data, "history": get_timeframe(data, timeframe, config)} if timeframe else data
 		if strategy == "ma_crossover":
-			signal = ma_crossover(data, config)
+			signal = ma_crossover(strategy_data, config)
 		elif strategy == "rsi":
-			signal = rsi(data, config)
+			signal = rsi(strategy_data, config)
 		elif strategy == "support_resist":
-			signal = support_resist(data, config)
+			signal = support_resist(strategy_data, config)
 		elif strategy == "volume_spike":
-			signal = volume_spike(data, config)
+			signal = volume_spike(strategy_data, config)
 		else:
 			logger.debug("Strategi %s tidak dikenali", strategy)
 			signal = None
 		if signal:
-			signals.append(signal)
+			# `strategy_id` dipakai untuk mencocokkan pilihan strategi tiap subscriber.
+			signals.append((strategy, {**signal, "strategy_id": strategy}))
 	return signals
 
 
-def process_signals(signals: list[dict], symbol: str, config: dict) -> None:
+def run_strategies(symbol: str, config: dict) -> list[dict]:
+	with profile_section(f"symbol_{symbol}", config, kind="symbol"):
+		data = fetch_data(symbol, config)
+		if not data:
+			logger.warning("Tidak ada data untuk %s, melewati strategi.", symbol)
+			return []
+		return [enrich_signal(strategy, signal, config) for strategy, signal in evaluate_strategies(data, config)]
+
+
+def render_charts(signals: list[dict], symbol: str, config: dict) -> list[dict]:
+	rendered = []
 	for signal in signals:
 		chart_path = generate_chart(signal.get("data", {}), symbol, config)
-		if chart_path:
-			signal = {**signal, "chart_path": chart_path}
-		log_signal(signal, config)
-		send_signal(signal, config)
+		rendered.append({**signal, "chart_path": chart_path} if chart_path else signal)
+	return rendered
 
 
+def deliver_signal(signal: dict, subscribers: list[Subscriber], config: dict) -> None:
+	"""Catat sinyal sekali, lalu kirim ke setiap subscriber non-digest yang berminat."""
+	log_signal(signal, config)
+	for subscriber in recipients(signal, subscribers):
+		if not subscriber.digest:
+			send_signal(signal, config, chat_id=subscriber.chat_id)
 
-def job_bsjs(style: str) -> None:
-	config = load_config()
-	config = {**config, "watchlist": {**config.get("watchlist", {}), "style": style}}
-	watchlist = generate_watchlist(config)
-	logger.info(f"Menjalankan job {style} untuk {len(watchlist)} simbol")
-	for symbol in watchlist:
+
+def finish_delivery(signals: list[dict], subscribers: list[Subscriber], config: dict) -> None:
+	"""Kirim digest per subscriber dan buka posisi setelah semua sinyal job terkumpul."""
+	title = f"Sinyal {config.get('watchlist', {}).get('style', '')}".strip()
+	for subscriber in subscribers:
+		if subscriber.digest:
+			send_digest([s for s in signals if subscriber.wants(s)], config, title=title, chat_id=subscriber.chat_id)
+	if signals and config.get("positions", {}).get("enabled"):
+		open_positions(
+			signals, config, chat_ids_for=lambda signal: [sub.chat_id for sub in recipients(signal, subscribers)]
+		)
+
+
+def dispatch_signals(signals: list[dict], subscribers: list[Subscriber], config: dict) -> None:
+	for signal in signals:
+		deliver_signal(signal, subscribers, config)
+	finish_delivery(signals, subscribers, config)
+
+
+def run_pipeline(watchlist: list[str], subscribers: list[Subscriber], config: dict) -> dict:
+	"""Job bertahap: fetch -> strategi -> enrichment -> chart -> sink, dengan antrian terbatas."""
+	pipeline_cfg = config.get("pipeline", {})
+	workers = pipeline_cfg.get("workers", {})
+	queue_size = int(pipeline_cfg.get("queue_size", 16))
+	# Risk pass portofolio butuh semua sinyal job, jadi sink hanya mengumpulkan.
+	risk_pass = portfolio_risk.is_enabled(config)
+	delivered: list[dict] = []
+
+	# Profil per simbol mengikuti simbol dari fetch sampai chart, melintasi thread stage.
+	def fetch_stage(symbol: str) -> list[tuple[str, dict, SymbolProfile]]:
+		profile = SymbolProfile(f"symbol_{symbol}", config)
+		with profile.stage("fetch"):
+			data = fetch_data(symbol, config)
+		if not data:
+			logger.warning("Tidak ada data untuk %s, melewati strategi.", symbol)
+			profile.finish()
+			return []
+		return [(symbol, data, profile)]
+
+	def strategy_stage(item: tuple[str, dict, SymbolProfile]) -> list[tuple[str, dict, SymbolProfile]]:
+		symbol, data, profile = item
+		with profile.stage("strategies"):
+			signals = evaluate_strategies(data, config)
+		profile.expect(len(signals))
+		return [(strategy, signal, profile) for strategy, signal in signals]
+
+	def enrichment_stage(item: tuple[str, dict, SymbolProfile]) -> list[tuple[dict, SymbolProfile]]:
+		strategy, signal, profile = item
+		with profile.stage("enrichment"):
+			return [(enrich_signal(strategy, signal, config), profile)]
+
+	def chart_stage(item: tuple[dict, SymbolProfile]) -> list[dict]:
+		signal, profile = item
+		with profile.stage("chart", final=True):
+			return render_charts([signal], signal.get("symbol", ""), config)
+
+	def sink_stage(signal: dict) -> list:
+		if not risk_pass:
+			deliver_signal(signal, subscribers, config)
+		delivered.append(signal)
+		return []
+
+	pipeline = Pipeline(
+		"job",
+		[
+			Stage("fetch", profile_stage(fetch_stage), workers.get("fetch", 4), queue_size),
+			Stage("strategies", profile_stage(strategy_stage), workers.get("strategies", 2), queue_size),
+			Stage("enrichment", profile_stage(enrichment_stage), workers.get("enrichment", 4), queue_size),
+			# pyplot tidak thread-safe, jadi chart default satu worker.
+			Stage("chart", profile_stage(chart_stage), workers.get("chart", 1), queue_size),
+			Stage("sinks", profile_stage(sink_stage), workers.get("sinks", 2), queue_size),
+		],
+		report_interval=float(pipeline_cfg.get("report_interval", 0)),
+	)
+	_ACTIVE_PIPELINES.add(pipeline)
+	try:
+		report = pipeline.run(watchlist)
+	finally:
+		_ACTIVE_PIPELINES.discard(pipeline)
+
+	if risk_pass:
+		dispatch_signals(portfolio_risk.assess_signals(delivered, config), subscribers, config)
+	else:
+		finish_delivery(delivered, subscribers, config)
+	return report
+
+
+def process_shard(symbols: list[str], config: dict) -> dict[str, list[dict]]:
+	"""Jalankan strategi + chart untuk satu shard; pengiriman dilakukan coordinator."""
+	# Hasil prekomputasi coordinator (mis. sentimen) masuk cache proses worker ini.
+	for namespace, values in config.get("precomputed", {}).items():
+		for symbol in symbols:
+			if symbol in values:
+				cache.write(namespace, symbol, values[symbol])
+	results: dict[str, list[dict]] = {}
+	for symbol in symbols:
 		try:
 			signals = run_strategies(symbol, config)
 			if signals:
-				process_signals(signals, symbol, config)
+				results[symbol] = render_charts(signals, symbol, config)
 		except Exception as exc:
 			logger.exception("Gagal memproses %s: %s", symbol, exc)
+	return results
+
+
+def drain_queue(path: str, lease_seconds: float, job_id: str | None = None) -> int:
+	"""Klaim dan kerjakan shard sampai antrian kosong. Mengembalikan jumlah shard."""
+	processed = 0
+	while True:
+		shard = job_queue.claim_shard(path, lease_seconds, job_id=job_id)
+		if not shard:
+			return processed
+		logger.info("Worker %s mengerjakan shard %s/%s", job_queue.worker_name(), shard["job_id"][:8], shard["shard_id"])
+		result = process_shard(shard["symbols"], shard["config"])
+		job_queue.complete_shard(path, shard, result)
+		processed += 1
+
+
+def _local_worker(path: str, lease_seconds: float, job_id: str) -> None:
+	drain_queue(path, lease_seconds, job_id=job_id)
+
+
+def run_worker(config: dict) -> None:
+	"""Mode worker: konsumsi shard dari antrian bersama secara terus-menerus."""
+	workers_cfg = config.get("workers", {})
+	path = job_queue.queue_path(config)
+	lease_seconds = float(workers_cfg.get("lease_seconds", 600))
+	poll_interval = float(workers_cfg.get("poll_interval", 2))
+	logger.info("Worker %s siap mengonsumsi antrian %s", job_queue.worker_name(), path)
+	try:
+		while True:
+			if not drain_queue(path, lease_seconds):
+				time.sleep(poll_interval)
+	except (KeyboardInterrupt, SystemExit):
+		logger.info("Worker dimatikan.")
+
+
+def run_sharded(watchlist: list[str], config: dict, precomputed: dict | None = None) -> list[dict]:
+	"""Coordinator: pecah watchlist ke antrian, tunggu worker, gabungkan sinyal.
+
+	`precomputed` ({namespace: {symbol: nilai}}) ikut disimpan di config job agar
+	worker di proses/host lain memakai hasil yang sama, bukan fetch ulang.
+	"""
+	workers_cfg = config.get("workers", {})
+	path = job_queue.queue_path(config)
+	lease_seconds = float(workers_cfg.get("lease_seconds", 600))
+	poll_interval = float(workers_cfg.get("poll_interval", 2))
+	timeout = float(workers_cfg.get("timeout", 1800))
+	job_config = {**config, "precomputed": precomputed} if precomputed else config
+	job_id = job_queue.enqueue_job(path, watchlist, job_config, workers_cfg.get("shard_size", 5))
+
+	# spawn, bukan fork: scheduler berjalan di thread sehingga lock/executor modul bisa
+	# tersalin dalam keadaan terkunci ke proses anak.
+	context = multiprocessing.get_context("spawn")
+	processes = [
+		context.Process(target=_local_worker, args=(path, lease_seconds, job_id), daemon=True)
+		for _ in range(int(workers_cfg.get("local_processes", 0)))
+	]
+	for process in processes:
+		process.start()
+
+	# Coordinator ikut mengerjakan shard agar job tetap jalan tanpa worker eksternal.
+	deadline = time.monotonic() + timeout
+	while job_queue.pending_count(path, job_id):
+		if time.monotonic() > deadline:
+			logger.error("Job %s timeout, sebagian shard tidak selesai.", job_id)
+			break
+		if not drain_queue(path, lease_seconds, job_id=job_id):
+			time.sleep(poll_interval)
+	for process in processes:
+		process.join(timeout=poll_interval)
+
+	signals = []
+	for result in job_queue.collect_results(path, job_id):
+		for symbol_signals in result.values():
+			signals.extend(symbol_signals)
+	job_queue.purge_job(path, job_id)
+	return signals
+
+
+def load_job_config(style: str) -> dict:
+	config = load_config()
+	return {**config, "watchlist": {**config.get("watchlist", {}), "style": style}}
+
+
+def prefetch_symbol(symbol: str, config: dict) -> None:
+	"""Isi cache data pasar + enrichment agar job utama tidak perlu menunggu jaringan."""
+	fetch_data(symbol, config)
+	if symbol.endswith(".JK"):
+		ingest_broker_summary(symbol, config, refresh=True)
+		ingest_running_trade(symbol, config)
+		fetch_corporate_action(symbol, config)
+
+
+def plan_job(style: str, config: dict) -> tuple[list[str], list[Subscriber], dict]:
+	"""Gabungan simbol + strategi semua subscriber style ini; tiap simbol dihitung sekali."""
+	subscribers = subscribers_for(style, config)
+	symbols, strategies = job_plan(subscribers, config)
+	return symbols, subscribers, {**config, "strategies": strategies}
+
+
+def job_prefetch(style: str) -> None:
+	watchlist, _, config = plan_job(style, load_job_config(style))
+	workers = int(config.get("scheduler", {}).get("prefetch_workers", 4))
+	logger.info("Prefetch %s untuk %d simbol", style, len(watchlist))
+	started = time.monotonic()
+	refresh_sentiment(watchlist, config, force=True)
+	with ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="prefetch") as executor:
+		futures = {executor.submit(prefetch_symbol, symbol, config): symbol for symbol in watchlist}
+		for future in as_completed(futures):
+			try:
+				future.result()
+			except Exception as exc:
+				logger.warning("Prefetch %s gagal: %s", futures[future], exc)
+	logger.info("Prefetch %s selesai dalam %.1fs", style, time.monotonic() - started)
+
+
+def job_bsjs(style: str) -> None:
+	config = load_job_config(style)
+	with profile_section(f"job_{style}", config, kind="job"):
+		_run_job(style, config)
+
+
+def _run_job(style: str, config: dict) -> None:
+	watchlist, subscribers, config = plan_job(style, config)
+	if not subscribers:
+		logger.info("Tidak ada subscriber untuk job %s, dilewati.", style)
+		return
+	logger.info(f"Menjalankan job {style} untuk {len(watchlist)} simbol ({len(subscribers)} subscriber)")
+	if config.get("workers", {}).get("enabled"):
+		# Sentimen dihitung sekali oleh coordinator lalu dibagikan ke worker lewat antrian.
+		sentiment = refresh_sentiment(watchlist, config)
+		signals = run_sharded(watchlist, config, precomputed={"news_sentiment": sentiment})
+		if portfolio_risk.is_enabled(config):
+			signals = portfolio_risk.assess_signals(signals, config)
+		dispatch_signals(signals, subscribers, config)
+		_log_source_health()
+		return
+	# Sentimen dihitung sekali per job, strategi cukup membaca cache.
+	refresh_sentiment(watchlist, config)
+	run_pipeline(watchlist, subscribers, config)
+	_log_source_health()
+
+
+def _log_source_health() -> None:
+	for name, health in source_health.snapshot().items():
+		logger.info("Sumber data %s: %s", name, health)
+
+
+def scheduled_job(style: str, prefetch: bool = False) -> None:
+	"""Wrapper cron: jalankan job hanya pada hari bursa IDX."""
+	config = load_config()
+	if not market_calendar.should_run(style, market_calendar.today(), config):
+		return
+	if prefetch:
+		job_prefetch(style)
+	else:
+		job_bsjs(style)
+
+
+def scheduled_position_poll() -> None:
+	config = load_config()
+	if not market_calendar.is_session_open(datetime.now(timezone.utc), config):
+		return
+	try:
+		poll_positions(config)
+	except Exception as exc:
+		logger.exception("Gagal memonitor posisi: %s", exc)
+
+
+def scheduled_alert_poll() -> None:
+	config = load_config()
+	if not market_calendar.is_session_open(datetime.now(timezone.utc), config):
+		return
+	try:
+		alerts.poll_alerts(config)
+	except Exception as exc:
+		logger.exception("Gagal mengevaluasi alert harga: %s", exc)
+
+
+def scheduled_haka_poll() -> None:
+	"""Ingest running trade seluruh watchlist IDX agar bucket HAKA selalu terkini."""
+	config = load_config()
+	if not market_calendar.is_session_open(datetime.now(timezone.utc), config):
+		return
+	symbols = [symbol for symbol in generate_watchlist(config) if symbol.endswith(".JK")]
+	workers = int(config.get("scheduler", {}).get("prefetch_workers", 4))
+	with ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="haka") as executor:
+		for symbol, added in zip(symbols, executor.map(lambda s: ingest_running_trade(s, config), symbols)):
+			logger.debug("HAKA %s: %d trade baru", symbol, added)
+
+
+def _shift_minutes(hour: int, minute: int, delta: int) -> tuple[int, int]:
+	total = (hour * 60 + minute + delta) % (24 * 60)
+	return total // 60, total % 60
+
+
+# (style, jam, menit) waktu Asia/Jakarta
+# BPJS: Beli Pagi Jual Sore (job pagi), BSJP: Beli Sore Jual Pagi (job sore)
+JOB_SCHEDULE = (("BPJS", 1, 0), ("BSJP", 8, 30))
+
+
+def _handle_sigterm(signum, frame) -> None:
+	# `docker stop` mengirim SIGTERM; jadikan SystemExit agar jalur shutdown yang sama berjalan.
+	raise SystemExit(0)
 
 
 if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="IDX trading bot scheduler")
+	parser.add_argument("--worker", action="store_true", help="jalankan sebagai worker antrian shard")
+	parser.add_argument("--profile", action="store_true", help="aktifkan profiling job (data/profiles/)")
+	parser.add_argument("--once", metavar="STYLE", help="jalankan satu job (mis. BSJP) lalu keluar")
+	parser.add_argument(
+		"--alert",
+		nargs="+",
+		metavar="ARG",
+		help="daftarkan alert harga: SYMBOL above|below HARGA atau SYMBOL support|resistance",
+	)
+	parser.add_argument("--chat", help="chat_id tujuan alert (default TELEGRAM_CHAT_ID)")
+	args = parser.parse_args()
+	if args.profile:
+		# Lewat env agar worker lokal (proses spawn) ikut ter-profil.
+		os.environ["PROFILE_JOBS"] = "true"
+	signal_module.signal(signal_module.SIGTERM, _handle_sigterm)
 
 	from utils.telegram import send_startup_message, send_signal
 	config = load_config()
+	if args.worker:
+		run_worker(config)
+		raise SystemExit(0)
+	if args.alert:
+		if len(args.alert) not in (2, 3):
+			parser.error("--alert membutuhkan SYMBOL OPERATOR [HARGA]")
+		try:
+			alert_price = float(args.alert[2].replace(",", "")) if len(args.alert) == 3 else None
+			created = alerts.add_alert(args.alert[0], args.alert[1], config, price=alert_price, chat_id=args.chat)
+		except ValueError as exc:
+			parser.error(str(exc))
+		if created:
+			logger.info("Alert %s terdaftar: %s %s %.2f", created["id"], created["symbol"], created["side"], created["price"])
+		raise SystemExit(0 if created else 1)
+	if args.once:
+		started = time.monotonic()
+		job_bsjs(args.once)
+		logger.info("Job %s selesai dalam %.2fs", args.once, time.monotonic() - started)
+		raise SystemExit(0)
 	send_startup_message(config)
 
 	# Kirim sinyal trading terbaru (BSJP/Swing) saat startup
@@ -103,33 +467,68 @@ if __name__ == "__main__":
 
 	from zoneinfo import ZoneInfo
 	scheduler = BackgroundScheduler(timezone=ZoneInfo("Asia/Jakarta"))
-	# BPJS: Beli Pagi Jual Sore (job pagi)
-	scheduler.add_job(
-		lambda: job_bsjs("BPJS"),
-		"cron",
-		day_of_week="mon-fri",
-		hour=1,
-		minute=0,
-		max_instances=1,
-		coalesce=True,
-		timezone=ZoneInfo("Asia/Jakarta")
-	)
-	# BSJP: Beli Sore Jual Pagi (job sore)
-	scheduler.add_job(
-		lambda: job_bsjs("BSJP"),
-		"cron",
-		day_of_week="mon-fri",
-		hour=8,
-		minute=30,
-		max_instances=1,
-		coalesce=True,
-		timezone=ZoneInfo("Asia/Jakarta")
-	)
+	prefetch_lead = int(config.get("scheduler", {}).get("prefetch_minutes", 3))
+	for job_style, hour, minute in JOB_SCHEDULE:
+		scheduler.add_job(
+			scheduled_job,
+			"cron",
+			args=(job_style,),
+			day_of_week="mon-fri",
+			hour=hour,
+			minute=minute,
+			max_instances=1,
+			coalesce=True,
+			timezone=ZoneInfo("Asia/Jakarta")
+		)
+		if prefetch_lead > 0:
+			prefetch_hour, prefetch_minute = _shift_minutes(hour, minute, -prefetch_lead)
+			scheduler.add_job(
+				scheduled_job,
+				"cron",
+				args=(job_style,),
+				kwargs={"prefetch": True},
+				day_of_week="mon-fri",
+				hour=prefetch_hour,
+				minute=prefetch_minute,
+				max_instances=1,
+				coalesce=True,
+				timezone=ZoneInfo("Asia/Jakarta")
+			)
+	positions_cfg = config.get("positions", {})
+	if positions_cfg.get("enabled"):
+		scheduler.add_job(
+			scheduled_position_poll,
+			"interval",
+			minutes=int(positions_cfg.get("poll_minutes", 5)),
+			max_instances=1,
+			coalesce=True,
+		)
+	alerts_cfg = config.get("alerts", {})
+	if alerts_cfg.get("enabled"):
+		scheduler.add_job(
+			scheduled_alert_poll,
+			"interval",
+			minutes=int(alerts_cfg.get("poll_minutes", 1)),
+			max_instances=1,
+			coalesce=True,
+		)
+	haka_cfg = config.get("haka", {})
+	if haka_cfg.get("poll_minutes"):
+		scheduler.add_job(
+			scheduled_haka_poll,
+			"interval",
+			minutes=int(haka_cfg["poll_minutes"]),
+			max_instances=1,
+			coalesce=True,
+		)
 	scheduler.start()
 	logger.info("Trading bot started. Press Ctrl+C to exit.")
 	try:
 		while True:
 			time.sleep(60)
 	except (KeyboardInterrupt, SystemExit):
+		# Job yang sedang jalan berhenti mengambil simbol baru, sinyal tertunda tetap dikirim.
+		for active in list(_ACTIVE_PIPELINES):
+			active.stop()
 		scheduler.shutdown()
 		logger.info("Scheduler dimatikan.")
@@ -3,7 +3,6 @@
 from __future__ import annotations
 
 import pandas as pd
-from utils.news_sentiment import fetch_news_sentiment, fetch_corporate_action
 
 
 def ma_crossover(data: dict, config: dict) -> dict | None:
@@ -41,16 +40,7 @@ def ma_crossover(data: dict, config: dict) -> dict | None:
 
     symbol = data.get("symbol")
     comment = f"MA{short_window}/{long_window} crossover {direction.lower()}"
-    # News sentiment & corporate action (IDX only)
-    if symbol and symbol.endswith(".JK"):
-        news = fetch_news_sentiment(symbol)
-        corp = fetch_corporate_action(symbol, config)
-        comment += f" | Sentimen: {news.get('sentiment')}"
-        if corp:
-            ca_type = corp.get('type')
-            ca_date = corp.get('date')
-            if ca_type:
-                comment += f" | CA: {ca_type} {ca_date if ca_date else ''}"
+    # News sentiment & corporate action ditambahkan oleh utils.enrichment
     return {
         "symbol": symbol,
         "strategy": f"MA Crossover ({direction})",
@@ -1,10 +1,10 @@
-"""Strategi support & resistance sederhana."""
+"""Strategi support & resistance multi-level berbasis pivot (utils.levels)."""
 
 from __future__ import annotations
 
 import pandas as pd
-from utils.bandarmology import fetch_broker_summary, analyze_bandar
-from utils.haka_power import fetch_haka_power, analyze_haka
+
+from utils.levels import level_key, nearest_levels, update_levels
 
 
 def support_resist(data: dict, config: dict) -> dict | None:
@@ -16,27 +16,26 @@ def support_resist(data: dict, config: dict) -> dict | None:
     params = config.get("strategy_params", {}).get("support_resist", {})
     lookback = params.get("lookback", 20)
     tolerance = params.get("tolerance", 0.0075)
+    min_touches = params.get("min_touches", 2)
 
     df = pd.DataFrame(history).sort_values("timestamp").tail(lookback)
     if df.empty:
         return None
 
-    recent_close = df["close"].iloc[-1]
-    support = df["low"].min()
-    resistance = df["high"].max()
+    recent_close = float(df["close"].iloc[-1])
+    key = level_key(symbol, params.get("timeframe"))
+    update_levels(key, history, config)
+    nearest = nearest_levels(key, recent_close, config, min_touches=min_touches)
+    support_level = nearest["support"]
+    resistance_level = nearest["resistance"]
+
+    # Tanpa level pivot di satu sisi, pakai ekstrem `lookback` bar terakhir.
+    support = support_level["price"] if support_level else float(df["low"].min())
+    resistance = resistance_level["price"] if resistance_level else float(df["high"].max())
 
     near_support = abs(recent_close - support) / support <= tolerance
     near_resistance = abs(recent_close - resistance) / resistance <= tolerance
 
-    # Bandarmology & HAKA Power integration for IDX symbols
-    bandar_info = None
-    haka_info = None
-    if symbol.endswith(".JK"):
-        broker_data = fetch_broker_summary(symbol, config)
-        bandar_info = analyze_bandar(broker_data) if broker_data else None
-        haka_data = fetch_haka_power(symbol, config)
-        haka_info = analyze_haka(haka_data) if haka_data else None
-
     if near_support:
         direction = "BUY"
         entry = support * (1 + tolerance / 2)
@@ -50,11 +49,11 @@ def support_resist(data: dict, config: dict) -> dict | None:
     else:
         return None
 
-    comment = f"Support={support:.2f} Resistance={resistance:.2f}"
-    if bandar_info:
-        comment += f" | Bandar: {bandar_info['status']} Top Buyer: {bandar_info['top_buyer']} Top Seller: {bandar_info['top_seller']} Net Buy: {bandar_info['net_buy']:.0f}"
-    if haka_info:
-        comment += f" | HAKA: {haka_info['momentum']} Power: {haka_info['power']:.0f}"
+    # Bandarmology & HAKA Power ditambahkan oleh utils.enrichment
+    comment = (
+        f"Support={support:.2f} ({support_level['touches'] if support_level else 0}x) "
+        f"Resistance={resistance:.2f} ({resistance_level['touches'] if resistance_level else 0}x)"
+    )
 
     return {
         "symbol": symbol,
@@ -0,0 +1,334 @@
+"""Alert harga pengguna (mis. "BBRI.JK above 4500", "TLKM.JK below support").
+
+Alert disimpan di `alerts.store_path` (JSON) dan diindeks per simbol dalam dua
+daftar harga terurut: `above` (terpicu bila high >= harga) dan `below`
+(terpicu bila low <= harga). Setiap quote hanya memotong prefix/suffix yang
+terpicu lewat `bisect`, sehingga biaya per tick tidak tumbuh dengan jumlah
+alert. Alert `support`/`resistance` di-resolve sekali saat didaftarkan ke
+level terdekat dari `utils.levels`.
+
+Alert hanya terpicu saat harga menembus level dari sisi harga ketika alert
+didaftarkan (`reference`). Alert yang didaftarkan saat harga sudah berada di
+sisi target (mis. "above 4500" ketika harga 4600) belum aktif (`armed`
+false): alert itu diindeks di sisi sebaliknya dan baru aktif setelah harga
+kembali melewati level. Perubahan file alert dilakukan di bawah file lock
+(dibaca ulang dulu, lalu ditulis) agar tidak bentrok dengan proses CLI;
+waktu poll terakhir disimpan terpisah di `<store>.state.json`.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import uuid
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+try:
+    import fcntl
+except ImportError:  # Windows: cukup lock antar-thread
+    fcntl = None
+
+import pandas as pd
+
+from utils.levels import level_key, nearest_levels
+from utils.positions import fetch_bulk_bars, fetch_bulk_quotes, quote_since
+from utils.telegram import send_text
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE = "data/alerts.json"
+OPERATORS = ("above", "below", "support", "resistance")
+_OPPOSITE = {"above": "below", "below": "above"}
+
+# symbol -> {"above": ([harga], [alert]), "below": ([harga], [alert])}
+_INDEX: Dict[str, Dict[str, tuple[List[float], List[Dict[str, Any]]]]] = {}
+_STATE: Dict[str, Any] = {"path": None, "version": None}
+_LOCK = threading.Lock()
+
+
+def _alerts_cfg(config: dict) -> dict[str, Any]:
+    return config.get("alerts", {})
+
+
+def _store_path(config: dict) -> Path:
+    return Path(_alerts_cfg(config).get("store_path", DEFAULT_STORE))
+
+
+def _poll_state_path(config: dict) -> Path:
+    path = _store_path(config)
+    return path.with_name(f"{path.stem}.state.json")
+
+
+@contextmanager
+def _store_lock(config: dict) -> Iterator[None]:
+    """Lock antar-thread dan antar-proses untuk baca-ubah-tulis file alert."""
+
+    lock_path = _store_path(config).with_suffix(".lock")
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with _LOCK, lock_path.open("a") as handle:
+        if fcntl is not None:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def _indexed_side(alert: Dict[str, Any]) -> str:
+    return alert["side"] if alert.get("armed", True) else _OPPOSITE[alert["side"]]
+
+
+def _index_alert(alert: Dict[str, Any]) -> None:
+    sides = _INDEX.setdefault(alert["symbol"], {"above": ([], []), "below": ([], [])})
+    prices, alerts = sides[_indexed_side(alert)]
+    position = bisect_right(prices, alert["price"])
+    prices.insert(position, alert["price"])
+    alerts.insert(position, alert)
+
+
+def _file_version(path: Path) -> tuple[int, int] | None:
+    if not path.exists():
+        return None
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _ensure_loaded(config: dict) -> None:
+    """Muat ulang indeks bila file berubah (mis. alert ditambah dari proses CLI).
+
+    Dipanggil di bawah `_store_lock` sebelum setiap perubahan, sehingga
+    perubahan selalu diterapkan ke isi file terbaru.
+    """
+
+    path = _store_path(config)
+    version = _file_version(path)
+    if _STATE["path"] == str(path) and _STATE["version"] == version:
+        return
+    _INDEX.clear()
+    state: Dict[str, Any] = {"alerts": []}
+    if path.exists():
+        with path.open("r", encoding="utf-8") as handle:
+            state = json.load(handle)
+    for alert in state.get("alerts", []):
+        _index_alert(alert)
+    _STATE.update(path=str(path), version=version)
+
+
+def _save(config: dict) -> None:
+    path = _store_path(config)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    alerts = [alert for sides in _INDEX.values() for _, items in sides.values() for alert in items]
+    tmp_path = path.with_suffix(".tmp")
+    with tmp_path.open("w", encoding="utf-8") as handle:
+        json.dump({"alerts": alerts}, handle, indent=1)
+    tmp_path.replace(path)
+    _STATE["version"] = _file_version(path)
+
+
+def _load_last_poll(config: dict) -> str | None:
+    path = _poll_state_path(config)
+    if not path.exists():
+        return None
+    try:
+        with path.open("r", encoding="utf-8") as handle:
+            return json.load(handle).get("last_poll")
+    except (OSError, ValueError) as exc:
+        logger.warning("State poll alert tidak terbaca: %s", exc)
+        return None
+
+
+def _save_last_poll(config: dict, last_poll: str) -> None:
+    path = _poll_state_path(config)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with tmp_path.open("w", encoding="utf-8") as handle:
+        json.dump({"last_poll": last_poll}, handle)
+    tmp_path.replace(path)
+
+
+def _current_price(symbol: str, config: dict) -> float | None:
+    quote = fetch_bulk_quotes([symbol], config).get(symbol)
+    return quote["price"] if quote else None
+
+
+def _resolve_level(symbol: str, operator: str, config: dict, reference: float | None) -> float | None:
+    if reference is None:
+        return None
+    timeframe = config.get("strategy_params", {}).get("support_resist", {}).get("timeframe")
+    min_touches = int(_alerts_cfg(config).get("min_touches", 2))
+    level = nearest_levels(level_key(symbol, timeframe), reference, config, min_touches=min_touches)[operator]
+    return level["price"] if level else None
+
+
+def add_alert(
+    symbol: str,
+    operator: str,
+    config: dict,
+    price: float | None = None,
+    chat_id: str | None = None,
+    note: str = "",
+) -> Dict[str, Any] | None:
+    """Daftarkan alert. `support`/`resistance` memakai level terdekat dari harga saat ini."""
+
+    symbol = symbol.strip().upper()
+    operator = operator.lower()
+    if operator not in OPERATORS:
+        raise ValueError(f"Operator alert tidak dikenal: {operator}")
+    if price is None and operator in {"above", "below"}:
+        raise ValueError("Alert above/below membutuhkan harga.")
+    current = _current_price(symbol, config)
+    level = None
+    if operator in {"support", "resistance"}:
+        level = operator
+        price = _resolve_level(symbol, operator, config, price if price is not None else current)
+        if price is None:
+            logger.warning("Level %s untuk %s belum tersedia. Alert tidak dibuat.", operator, symbol)
+            return None
+
+    # Harga turun menembus support, naik menembus resistance.
+    side = "below" if operator in {"below", "support"} else "above"
+    price = float(price)
+    armed = current is None or (current < price if side == "above" else current > price)
+    if current is None:
+        logger.warning("Harga %s saat ini tidak tersedia; alert langsung aktif.", symbol)
+    alert = {
+        "id": uuid.uuid4().hex[:12],
+        "symbol": symbol,
+        "side": side,
+        "price": price,
+        "reference": current,
+        "armed": armed,
+        "level": level,
+        "chat_id": chat_id,
+        "note": note,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+    with _store_lock(config):
+        _ensure_loaded(config)
+        _index_alert(alert)
+        _save(config)
+    return alert
+
+
+def remove_alert(alert_id: str, config: dict) -> bool:
+    with _store_lock(config):
+        _ensure_loaded(config)
+        for sides in _INDEX.values():
+            for prices, alerts in sides.values():
+                for position, alert in enumerate(alerts):
+                    if alert["id"] == alert_id:
+                        del prices[position], alerts[position]
+                        _save(config)
+                        return True
+    return False
+
+
+def _triggered(symbol: str, high: float, low: float) -> List[Dict[str, Any]]:
+    """Pop alert yang terpicu oleh rentang [low, high]; O(log n + k)."""
+
+    sides = _INDEX.get(symbol)
+    if not sides:
+        return []
+    fired: List[Dict[str, Any]] = []
+    prices, alerts = sides["above"]
+    cut = bisect_right(prices, high)
+    if cut:
+        fired.extend(alerts[:cut])
+        del prices[:cut], alerts[:cut]
+    prices, alerts = sides["below"]
+    cut = bisect_left(prices, low)
+    if cut < len(prices):
+        fired.extend(alerts[cut:])
+        del prices[cut:], alerts[cut:]
+    if not sides["above"][0] and not sides["below"][0]:
+        del _INDEX[symbol]
+    return fired
+
+
+def _crossed(alert: Dict[str, Any], quote: Dict[str, float]) -> bool:
+    if _indexed_side(alert) == "above":
+        return quote["high"] >= alert["price"]
+    return quote["low"] <= alert["price"]
+
+
+def _emit(alert: Dict[str, Any], quote: Dict[str, float], config: dict) -> None:
+    label = f"{alert['level']} " if alert.get("level") else ""
+    direction = "naik di atas" if alert["side"] == "above" else "turun di bawah"
+    lines = [
+        f"⏰ ALERT — {alert['symbol']}",
+        f"Harga {direction} {label}{alert['price']:.2f}",
+        f"Last Price : {quote['price']}",
+    ]
+    if alert.get("note"):
+        lines.append(f"Catatan : {alert['note']}")
+    send_text("\n".join(lines), config, chat_id=alert.get("chat_id"))
+
+
+def check_quotes(
+    quotes: Dict[str, Dict[str, float]],
+    config: dict,
+    bars: Dict[str, pd.DataFrame] | None = None,
+    since: str | None = None,
+) -> int:
+    """Evaluasi alert terhadap quote `{symbol: {price, high, low}}`. Mengembalikan jumlah alert terpicu.
+
+    Dengan `bars`, kandidat dari indeks dicek ulang hanya terhadap bar setelah
+    max(`since`, waktu alert dibuat) agar bar sebelum pendaftaran tidak memicu.
+    """
+
+    fired = []
+    with _store_lock(config):
+        _ensure_loaded(config)
+        changed = False
+        for symbol, quote in quotes.items():
+            symbol_bars = (bars or {}).get(symbol)
+            for alert in _triggered(symbol, quote["high"], quote["low"]):
+                own = quote
+                if symbol_bars is not None:
+                    own = quote_since(symbol_bars, max(filter(None, (since, alert["created_at"])))) or quote
+                if not _crossed(alert, own):
+                    _index_alert(alert)
+                    continue
+                changed = True
+                if not alert.get("armed", True):
+                    # Harga sudah kembali ke sisi awal; tembusan berikutnya memicu alert.
+                    alert["armed"] = True
+                    _index_alert(alert)
+                    continue
+                fired.append((alert, quote))
+        if changed:
+            _save(config)
+    for alert, quote in fired:
+        _emit(alert, quote, config)
+    return len(fired)
+
+
+def alert_symbols(config: dict) -> List[str]:
+    with _store_lock(config):
+        _ensure_loaded(config)
+        return sorted(_INDEX)
+
+
+def poll_alerts(config: dict) -> None:
+    """Satu siklus: satu bulk quote untuk semua simbol yang punya alert aktif."""
+
+    symbols = alert_symbols(config)
+    if not symbols:
+        return
+    now = datetime.now(timezone.utc).isoformat()
+    since = _load_last_poll(config)
+    bars = fetch_bulk_bars(symbols, config)
+    quotes = {}
+    for symbol, symbol_bars in bars.items():
+        quote = quote_since(symbol_bars, since)
+        if quote:
+            quotes[symbol] = quote
+    fired = check_quotes(quotes, config, bars=bars, since=since)
+    _save_last_poll(config, now)
+    logger.info("Alert harga: %d simbol dicek, %d alert terpicu.", len(symbols), fired)
@@ -4,12 +4,17 @@ import os
 import logging
 import requests
 
+from utils import cache
+
 logger = logging.getLogger(__name__)
 
 GOAPI_BROKER_ENDPOINT = "idx/{symbol}/broker-summary"
 
 
 def fetch_broker_summary(symbol: str, config: dict) -> dict | None:
+    cached = cache.read("broker_summary", symbol, cache.enrichment_ttl(config))
+    if cached is not None:
+        return cached
     goapi_cfg = config.get("data_sources", {}).get("goapi", {})
     token = os.getenv(goapi_cfg.get("token_env", "GOAPI_TOKEN_1")) or os.getenv("GOAPI_TOKEN_1") or os.getenv("GOAPI_TOKEN_2") or goapi_cfg.get("token")
     if not token:
@@ -22,7 +27,9 @@ def fetch_broker_summary(symbol: str, config: dict) -> dict | None:
     try:
         response = requests.get(url, headers=headers, timeout=timeout)
         response.raise_for_status()
-        return response.json().get("data")
+        data = response.json().get("data")
+        cache.write("broker_summary", symbol, data)
+        return data
     except requests.RequestException as exc:
         logger.warning("Gagal mengambil broker summary %s: %s", symbol, exc)
         return None
@@ -35,10 +42,8 @@ def analyze_bandar(data: dict) -> dict:
     if not data or "brokers" not in data:
         return {"status": "Netral", "top_buyer": None, "top_seller": None, "net_buy": 0}
     brokers = data["brokers"]
-    sorted_buy = sorted(brokers, key=lambda x: x.get("buy_value", 0), reverse=True)
-    sorted_sell = sorted(brokers, key=lambda x: x.get("sell_value", 0), reverse=True)
-    top_buyer = sorted_buy[0]["broker_code"] if sorted_buy else None
-    top_seller = sorted_sell[0]["broker_code"] if sorted_sell else None
+    top_buyer = max(brokers, key=lambda x: x.get("buy_value", 0))["broker_code"] if brokers else None
+    top_seller = max(brokers, key=lambda x: x.get("sell_value", 0))["broker_code"] if brokers else None
     net_buy = sum(b["buy_value"] - b["sell_value"] for b in brokers)
     status = "Akumulasi" if net_buy > 0 else ("Distribusi" if net_buy < 0 else "Netral")
     return {"status": status, "top_buyer": top_buyer, "top_seller": top_seller, "net_buy": net_buy}
@@ -0,0 +1,254 @@
+"""Indeks broker flow multi-hari (SQLite) untuk query bandarmology lintas simbol.
+
+Broker summary harian di-ingest sekali per simbol per hari. Akumulasi net
+per broker untuk tiap window N hari bursa (`bandarmology.windows`) disimpan
+di tabel `broker_rolling` dan diperbarui inkremental: tambah hari baru,
+kurangi hari yang keluar dari window. Query top akumulator per simbol maupun
+simbol yang diakumulasi satu broker cukup membaca indeks tanpa HTTP.
+"""
+
+from __future__ import annotations
+
+import logging
+import sqlite3
+import threading
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Sequence
+
+from utils import market_calendar
+from utils.bandarmology import fetch_broker_summary
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_PATH = "data/broker_flow.sqlite"
+DEFAULT_WINDOWS = (5, 20)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS broker_daily (
+    symbol TEXT NOT NULL,
+    day TEXT NOT NULL,
+    broker TEXT NOT NULL,
+    buy_value REAL NOT NULL,
+    sell_value REAL NOT NULL,
+    PRIMARY KEY (symbol, day, broker)
+);
+CREATE INDEX IF NOT EXISTS idx_broker_daily_broker ON broker_daily (broker, day);
+CREATE TABLE IF NOT EXISTS ingested (
+    symbol TEXT NOT NULL,
+    day TEXT NOT NULL,
+    PRIMARY KEY (symbol, day)
+);
+CREATE TABLE IF NOT EXISTS broker_rolling (
+    symbol TEXT NOT NULL,
+    window_days INTEGER NOT NULL,
+    broker TEXT NOT NULL,
+    buy_value REAL NOT NULL,
+    sell_value REAL NOT NULL,
+    net_value REAL NOT NULL,
+    PRIMARY KEY (symbol, window_days, broker)
+);
+CREATE INDEX IF NOT EXISTS idx_broker_rolling_net ON broker_rolling (symbol, window_days, net_value);
+CREATE INDEX IF NOT EXISTS idx_broker_rolling_broker ON broker_rolling (broker, window_days, net_value);
+"""
+
+_LOCK = threading.Lock()
+
+
+def _bandar_cfg(config: dict) -> dict[str, Any]:
+    return config.get("bandarmology", {})
+
+
+def _windows(config: dict) -> List[int]:
+    return sorted({int(w) for w in _bandar_cfg(config).get("windows", DEFAULT_WINDOWS)})
+
+
+def _connect(config: dict) -> sqlite3.Connection:
+    path = Path(_bandar_cfg(config).get("index_path", DEFAULT_INDEX_PATH))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _session_day(config: dict) -> str:
+    return market_calendar.last_trading_day(datetime.now(timezone.utc), config).isoformat()
+
+
+def _payload_day(data: dict, config: dict) -> str | None:
+    """Tanggal bursa milik snapshot: dari payload, atau hari bursa terakhir. None bila bukan hari bursa."""
+
+    raw = data.get("date") or data.get("trade_date")
+    day = None
+    if raw:
+        try:
+            day = date.fromisoformat(str(raw)[:10])
+        except ValueError:
+            logger.debug("Tanggal broker summary tidak dikenali: %s", raw)
+    if day is None:
+        return _session_day(config)
+    if not market_calendar.is_trading_day(day, config):
+        return None
+    return day.isoformat()
+
+
+def _days(conn: sqlite3.Connection, symbol: str) -> List[str]:
+    rows = conn.execute("SELECT day FROM ingested WHERE symbol = ? ORDER BY day DESC", (symbol,))
+    return [row[0] for row in rows]
+
+
+def _rebuild(conn: sqlite3.Connection, symbol: str, windows: Sequence[int]) -> None:
+    days = _days(conn, symbol)
+    conn.execute("DELETE FROM broker_rolling WHERE symbol = ?", (symbol,))
+    for window in windows:
+        if not days:
+            break
+        cutoff = days[min(window, len(days)) - 1]
+        conn.execute(
+            "INSERT INTO broker_rolling (symbol, window_days, broker, buy_value, sell_value, net_value) "
+            "SELECT symbol, ?, broker, SUM(buy_value), SUM(sell_value), SUM(buy_value - sell_value) "
+            "FROM broker_daily WHERE symbol = ? AND day >= ? GROUP BY broker",
+            (window, symbol, cutoff),
+        )
+
+
+def _apply_day(conn: sqlite3.Connection, symbol: str, day: str, sign: int, window: int) -> None:
+    conn.execute(
+        "INSERT INTO broker_rolling (symbol, window_days, broker, buy_value, sell_value, net_value) "
+        "SELECT symbol, ?, broker, ? * buy_value, ? * sell_value, ? * (buy_value - sell_value) "
+        "FROM broker_daily WHERE symbol = ? AND day = ? "
+        "ON CONFLICT (symbol, window_days, broker) DO UPDATE SET "
+        "buy_value = buy_value + excluded.buy_value, "
+        "sell_value = sell_value + excluded.sell_value, "
+        "net_value = net_value + excluded.net_value",
+        (window, sign, sign, sign, symbol, day),
+    )
+
+
+def _store_snapshot(conn: sqlite3.Connection, symbol: str, day: str, brokers: List[dict], windows: Sequence[int]) -> None:
+    previous_days = _days(conn, symbol)
+    conn.executemany(
+        "INSERT OR REPLACE INTO broker_daily (symbol, day, broker, buy_value, sell_value) VALUES (?, ?, ?, ?, ?)",
+        [
+            (symbol, day, b["broker_code"], float(b.get("buy_value", 0)), float(b.get("sell_value", 0)))
+            for b in brokers
+            if b.get("broker_code")
+        ],
+    )
+    conn.execute("INSERT OR IGNORE INTO ingested (symbol, day) VALUES (?, ?)", (symbol, day))
+    built = {row[0] for row in conn.execute("SELECT DISTINCT window_days FROM broker_rolling WHERE symbol = ?", (symbol,))}
+    if (previous_days and day <= previous_days[0]) or (previous_days and built != set(windows)):
+        # Backfill/refresh hari lama atau window berubah: hitung ulang penuh simbol ini.
+        _rebuild(conn, symbol, windows)
+        return
+    for window in windows:
+        _apply_day(conn, symbol, day, 1, window)
+        if len(previous_days) >= window:
+            _apply_day(conn, symbol, previous_days[window - 1], -1, window)
+    conn.execute("DELETE FROM broker_rolling WHERE symbol = ? AND buy_value = 0 AND sell_value = 0", (symbol,))
+
+
+def _is_known(symbol: str, day: str, config: dict) -> bool:
+    with _LOCK:
+        conn = _connect(config)
+        try:
+            return conn.execute("SELECT 1 FROM ingested WHERE symbol = ? AND day = ?", (symbol, day)).fetchone() is not None
+        finally:
+            conn.close()
+
+
+def ingest_broker_summary(symbol: str, config: dict, day: str | None = None, refresh: bool = False) -> bool:
+    """Ingest broker summary `symbol` untuk hari bursa terakhir (sekali per hari kecuali `refresh`).
+
+    Snapshot dikunci ke tanggal bursa di payload (fallback: hari bursa terakhir
+    menurut `market_calendar`), bukan tanggal jam dinding, sehingga run akhir
+    pekan/libur/pra-buka tidak menghitung sesi yang sama dua kali.
+    """
+
+    expected = day or _session_day(config)
+    if _is_known(symbol, expected, config) and not refresh:
+        return False
+    # Request jaringan di luar lock agar worker enrichment/prefetch lain tidak antre.
+    data = fetch_broker_summary(symbol, config)
+    if not data or not data.get("brokers"):
+        return False
+    day = day or _payload_day(data, config)
+    if day is None:
+        logger.info("Broker summary %s bertanggal %s bukan hari bursa. Dilewati.", symbol, data.get("date"))
+        return False
+    windows = _windows(config)
+    with _LOCK:
+        conn = _connect(config)
+        try:
+            # Cek ulang: worker lain bisa sudah meng-ingest hari yang sama selama fetch.
+            known = conn.execute("SELECT 1 FROM ingested WHERE symbol = ? AND day = ?", (symbol, day)).fetchone()
+            if known and not refresh:
+                return False
+            with conn:
+                if known:
+                    conn.execute("DELETE FROM broker_daily WHERE symbol = ? AND day = ?", (symbol, day))
+                _store_snapshot(conn, symbol, day, data["brokers"], windows)
+        finally:
+            conn.close()
+    logger.debug("Broker summary %s (%s) masuk indeks.", symbol, day)
+    return True
+
+
+def latest_snapshot(symbol: str, config: dict) -> Dict[str, Any] | None:
+    """Snapshot broker summary hari terakhir dari indeks, format sama dengan GoAPI."""
+
+    with _LOCK:
+        conn = _connect(config)
+        try:
+            days = _days(conn, symbol)
+            if not days:
+                return None
+            rows = conn.execute(
+                "SELECT broker, buy_value, sell_value FROM broker_daily WHERE symbol = ? AND day = ?",
+                (symbol, days[0]),
+            ).fetchall()
+        finally:
+            conn.close()
+    return {
+        "date": days[0],
+        "brokers": [{"broker_code": b, "buy_value": buy, "sell_value": sell} for b, buy, sell in rows],
+    }
+
+
+def _ensure_window(window: int, config: dict) -> None:
+    if window not in _windows(config):
+        raise ValueError(f"Window {window} hari tidak ada di bandarmology.windows")
+
+
+def top_accumulating_brokers(symbol: str, window: int, config: dict, limit: int = 5) -> List[Dict[str, Any]]:
+    """Broker dengan net buy terbesar untuk `symbol` selama `window` hari bursa terakhir."""
+
+    with _LOCK:
+        conn = _connect(config)
+        try:
+            _ensure_window(window, config)
+            rows = conn.execute(
+                "SELECT broker, buy_value, sell_value, net_value FROM broker_rolling "
+                "WHERE symbol = ? AND window_days = ? AND net_value > 0 ORDER BY net_value DESC LIMIT ?",
+                (symbol, window, limit),
+            ).fetchall()
+        finally:
+            conn.close()
+    return [{"broker": b, "buy_value": buy, "sell_value": sell, "net_value": net} for b, buy, sell, net in rows]
+
+
+def symbols_accumulated_by(broker: str, window: int, config: dict, limit: int = 20) -> List[Dict[str, Any]]:
+    """Simbol di mana `broker` sedang akumulasi (net buy > 0) selama `window` hari."""
+
+    with _LOCK:
+        conn = _connect(config)
+        try:
+            _ensure_window(window, config)
+            rows = conn.execute(
+                "SELECT symbol, net_value FROM broker_rolling "
+                "WHERE broker = ? AND window_days = ? AND net_value > 0 ORDER BY net_value DESC LIMIT ?",
+                (broker.upper(), window, limit),
+            ).fetchall()
+        finally:
+            conn.close()
+    return [{"symbol": symbol, "net_value": net} for symbol, net in rows]
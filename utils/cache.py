@@ -0,0 +1,34 @@
+"""Cache TTL in-memory bersama untuk data enrichment (broker, HAKA, news, CA)."""
+
+from __future__ import annotations
+
+import copy
+import threading
+import time
+from typing import Any, Dict, Tuple
+
+DEFAULT_TTL = 600
+
+_STORE: Dict[Tuple[str, str], Tuple[float, Any]] = {}
+_LOCK = threading.Lock()
+
+
+def enrichment_ttl(config: dict | None) -> int:
+    sources = (config or {}).get("data_sources", {})
+    return int(sources.get("enrichment_cache_ttl", DEFAULT_TTL))
+
+
+def read(namespace: str, key: str, ttl: float) -> Any | None:
+    with _LOCK:
+        cached = _STORE.get((namespace, key))
+    if not cached:
+        return None
+    stored_at, value = cached
+    if time.time() - stored_at > ttl:
+        return None
+    return copy.deepcopy(value)
+
+
+def write(namespace: str, key: str, value: Any) -> None:
+    with _LOCK:
+        _STORE[(namespace, key)] = (time.time(), copy.deepcopy(value))
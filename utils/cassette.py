@@ -0,0 +1,209 @@
+"""Record/replay respons upstream (GoAPI, IDX, Telegram, yfinance) ke cassette lokal.
+
+Mode diatur lewat env `HTTP_CASSETTE` (`record` / `replay`) atau
+`cassette.mode`. Semua request `requests` dicegat di `Session.request`;
+yfinance (yang tidak memakai `requests`) direkam di level pemanggilan lewat
+`cassette.call`. Cassette berupa JSON Lines ber-gzip. Saat replay, request
+yang tidak ada di cassette gagal seperti jaringan putus, dan latensi bisa
+mengikuti rekaman (`original`) atau angka tetap dalam detik.
+
+Setiap sesi `record` dimulai dari cassette kosong: file lama dipindah ke
+`<path>.prev`. Worker lokal hasil spawn mewarisi sesi rekaman coordinator
+(lewat env) dan menambah ke file yang sama; setiap append memakai file lock
+agar member gzip dari beberapa proses tidak saling menyela.
+
+Cassette memuat hasil pickle untuk objek non-HTTP; hanya replay cassette
+yang Anda rekam sendiri.
+"""
+
+from __future__ import annotations
+
+import base64
+import gzip
+import hashlib
+import json
+import logging
+import os
+import pickle
+import re
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+try:
+    import fcntl
+except ImportError:  # Windows: cukup lock antar-thread
+    fcntl = None
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = "data/cassettes/default.jsonl.gz"
+_KEPT_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+_TOKEN_IN_URL = re.compile(r"/bot[^/]+/")
+# Menandai proses yang sudah memulai sesi rekaman; diwarisi worker spawn.
+_SESSION_ENV = "HTTP_CASSETTE_SESSION"
+
+_STATE: Dict[str, Any] = {"mode": None, "path": None, "latency": "original", "entries": None, "cursor": None}
+_LOCK = threading.Lock()
+_ORIGINAL_REQUEST = requests.Session.request
+
+
+def _scrub_url(url: str) -> str:
+    return _TOKEN_IN_URL.sub("/bot<token>/", url)
+
+
+def _digest(value: Any) -> str:
+    return hashlib.sha1(json.dumps(value, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+
+def _request_key(method: str, url: str, kwargs: dict) -> str:
+    body = {name: kwargs.get(name) for name in ("params", "json", "data") if kwargs.get(name)}
+    return f"http {method.upper()} {_scrub_url(url)} {_digest(body)}"
+
+
+def _append(entry: Dict[str, Any]) -> None:
+    path = Path(_STATE["path"])
+    path.parent.mkdir(parents=True, exist_ok=True)
+    line = (json.dumps(entry) + "\n").encode("utf-8")
+    with _LOCK, path.with_name(f"{path.name}.lock").open("a") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            with gzip.open(path, "ab") as handle:
+                handle.write(line)
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _start_recording(path: Path) -> None:
+    """Rotasi cassette lama sekali per sesi agar replay tidak memutar respons basi."""
+
+    if os.getenv(_SESSION_ENV) == str(path):
+        return
+    if path.exists():
+        previous = path.with_name(f"{path.name}.prev")
+        path.replace(previous)
+        logger.info("Cassette lama dipindah ke %s.", previous)
+    os.environ[_SESSION_ENV] = str(path)
+
+
+def _load_entries() -> Dict[str, List[Dict[str, Any]]]:
+    with _LOCK:
+        if _STATE["entries"] is None:
+            entries: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+            path = Path(_STATE["path"])
+            if path.exists():
+                with gzip.open(path, "rt", encoding="utf-8") as handle:
+                    for line in handle:
+                        entry = json.loads(line)
+                        entries[entry["key"]].append(entry)
+            else:
+                logger.warning("Cassette %s tidak ditemukan; semua request akan gagal.", path)
+            _STATE["entries"] = entries
+            _STATE["cursor"] = defaultdict(int)
+        return _STATE["entries"]
+
+
+def _next_entry(key: str) -> Dict[str, Any] | None:
+    entries = _load_entries().get(key)
+    if not entries:
+        return None
+    with _LOCK:
+        # Respons berulang untuk key sama diputar berurutan, lalu tetap di yang terakhir.
+        index = min(_STATE["cursor"][key], len(entries) - 1)
+        _STATE["cursor"][key] += 1
+    return entries[index]
+
+
+def _sleep_latency(entry: Dict[str, Any]) -> None:
+    latency = _STATE["latency"]
+    delay = entry.get("elapsed", 0.0) if latency == "original" else float(latency)
+    if delay > 0:
+        time.sleep(delay)
+
+
+def _patched_request(session: requests.Session, method: str, url: str, **kwargs: Any) -> requests.Response:
+    key = _request_key(method, url, kwargs)
+    if _STATE["mode"] == "replay":
+        entry = _next_entry(key)
+        if entry is None:
+            raise requests.ConnectionError(f"Tidak ada di cassette: {key}")
+        _sleep_latency(entry)
+        response = requests.Response()
+        response.status_code = entry["status"]
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response._content = base64.b64decode(entry["body"])
+        response.url = url
+        response.encoding = "utf-8"
+        response.request = requests.Request(method, url).prepare()
+        return response
+
+    started = time.perf_counter()
+    response = _ORIGINAL_REQUEST(session, method, url, **kwargs)
+    _append(
+        {
+            "key": key,
+            "status": response.status_code,
+            "headers": {name: response.headers[name] for name in _KEPT_HEADERS if name in response.headers},
+            "body": base64.b64encode(response.content).decode("ascii"),
+            "elapsed": time.perf_counter() - started,
+        }
+    )
+    return response
+
+
+def call(namespace: str, key_parts: Any, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Rekam/replay hasil pemanggilan non-HTTP (mis. yfinance) di cassette yang sama."""
+
+    mode = _STATE["mode"]
+    if mode is None:
+        return func(*args, **kwargs)
+    key = f"call {namespace} {_digest(key_parts)}"
+    if mode == "replay":
+        entry = _next_entry(key)
+        if entry is None:
+            raise requests.ConnectionError(f"Tidak ada di cassette: {namespace} {key_parts}")
+        _sleep_latency(entry)
+        return pickle.loads(base64.b64decode(entry["body"]))
+
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    _append(
+        {
+            "key": key,
+            "body": base64.b64encode(pickle.dumps(result)).decode("ascii"),
+            "elapsed": time.perf_counter() - started,
+        }
+    )
+    return result
+
+
+def install(config: dict | None = None) -> None:
+    """Aktifkan record/replay sesuai env/config. Aman dipanggil berulang."""
+
+    cfg = (config or {}).get("cassette", {})
+    mode = (os.getenv("HTTP_CASSETTE") or cfg.get("mode") or "").strip().lower() or None
+    if mode not in {None, "record", "replay"}:
+        logger.warning("Mode cassette %s tidak dikenal. Cassette dinonaktifkan.", mode)
+        mode = None
+    with _LOCK:
+        _STATE.update(
+            mode=mode,
+            path=os.getenv("HTTP_CASSETTE_PATH") or cfg.get("path") or DEFAULT_PATH,
+            latency=os.getenv("HTTP_REPLAY_LATENCY") or str(cfg.get("latency", "original")),
+            entries=None,
+            cursor=None,
+        )
+    if mode is None:
+        requests.Session.request = _ORIGINAL_REQUEST
+        return
+    if mode == "record":
+        _start_recording(Path(_STATE["path"]))
+    requests.Session.request = _patched_request
+    logger.info("Cassette %s aktif: %s", mode, _STATE["path"])
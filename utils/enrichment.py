@@ -0,0 +1,70 @@
+"""Enrichment sinyal IDX: sentimen, corporate action, bandarmology, HAKA.
+
+Dipisah dari strategi agar strategi murni menghitung indikator, sedangkan
+lookup jaringan/indeks hanya dilakukan untuk simbol yang benar-benar
+menghasilkan sinyal (dan bisa berjalan di stage pipeline tersendiri).
+"""
+
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, List
+
+from utils.bandarmology import analyze_bandar
+from utils.broker_flow import ingest_broker_summary, latest_snapshot, top_accumulating_brokers
+from utils.haka_power import haka_momentum, ingest_running_trade
+from utils.news_sentiment import fetch_corporate_action, fetch_news_sentiment
+
+
+def _news_context(symbol: str, config: dict) -> List[str]:
+    news = fetch_news_sentiment(symbol, config)
+    corp = fetch_corporate_action(symbol, config)
+    parts = [f"Sentimen: {news.get('sentiment')}"]
+    if corp:
+        ca_type = corp.get('type')
+        ca_date = corp.get('date')
+        if ca_type:
+            parts.append(f"CA: {ca_type} {ca_date if ca_date else ''}")
+    return parts
+
+
+def _flow_context(symbol: str, config: dict) -> List[str]:
+    parts = []
+    # Broker summary hanya di-fetch sekali per hari; sisanya dibaca dari indeks.
+    ingest_broker_summary(symbol, config)
+    broker_data = latest_snapshot(symbol, config)
+    bandar_info = analyze_bandar(broker_data) if broker_data else None
+    if bandar_info:
+        parts.append(
+            f"Bandar: {bandar_info['status']} Top Buyer: {bandar_info['top_buyer']} "
+            f"Top Seller: {bandar_info['top_seller']} Net Buy: {bandar_info['net_buy']:.0f}"
+        )
+    flow_window = int(config.get("bandarmology", {}).get("signal_window", 5))
+    accumulators = top_accumulating_brokers(symbol, flow_window, config, limit=3)
+    if accumulators:
+        parts.append(f"Akumulasi {flow_window}D: " + ", ".join(a["broker"] for a in accumulators))
+    # Hanya trade baru sejak cursor terakhir yang diambil.
+    ingest_running_trade(symbol, config)
+    haka_info = haka_momentum(symbol, int(config.get("haka", {}).get("window_minutes", 30)))
+    if haka_info:
+        parts.append(f"HAKA: {haka_info['momentum']} Power: {haka_info['power']:.0f}")
+    return parts
+
+
+ENRICHERS: Dict[str, Callable[[str, dict], List[str]]] = {
+    "ma_crossover": _news_context,
+    "support_resist": _flow_context,
+}
+
+
+def enrich_signal(strategy: str, signal: Dict[str, Any], config: dict) -> Dict[str, Any]:
+    """Tambahkan konteks enrichment ke komentar sinyal (hanya simbol IDX)."""
+
+    enricher = ENRICHERS.get(strategy)
+    symbol = signal.get("symbol") or ""
+    if enricher is None or not symbol.endswith(".JK"):
+        return signal
+    parts = enricher(symbol, config)
+    if not parts:
+        return signal
+    comment = signal.get("comment", "")
+    return {**signal, "comment": " | ".join([comment, *parts]) if comment else " | ".join(parts)}
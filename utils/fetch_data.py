@@ -1,18 +1,30 @@
-"""Data fetcher untuk gabungan yfinance + GoAPI dengan caching sederhana."""
+"""Data fetcher untuk gabungan yfinance + GoAPI dengan caching sederhana.
+
+Orkestrasi sumber diatur lewat `data_sources.mode`:
+- `priority`: panggil sumber berurutan dan berhenti begitu price + history lengkap.
+- `race`: panggil semua sumber paralel, hasil lengkap pertama yang menang.
+- `merge`: panggil semua sumber paralel lalu gabungkan sesuai urutan prioritas.
+Sumber yang gagal beruntun dilewati oleh circuit breaker (`utils.source_health`).
+"""
 
 from __future__ import annotations
 
 import copy
 import logging
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeout
 from datetime import datetime, timezone
-from typing import Any, Dict
+from typing import Any, Callable, Dict
 import itertools
 
 import pandas as pd
 import requests
 import yfinance as yf
 
+from utils import cassette, source_health
+
 logger = logging.getLogger(__name__)
 
 _CACHE: Dict[str, Dict[str, Any]] = {}
@@ -30,7 +42,8 @@ def _get_goapi_tokens() -> list[str]:
         tokens.append(t_main)
     return tokens
 
-_GOAPI_TOKEN_CYCLE = itertools.cycle(_get_goapi_tokens())
+_GOAPI_TOKENS = _get_goapi_tokens()
+_GOAPI_TOKEN_CYCLE = itertools.cycle(_GOAPI_TOKENS)
 
 
 def _env_truthy(value: str | None) -> bool:
@@ -77,29 +90,38 @@ def _build_history(records: pd.DataFrame, window: int) -> list[dict[str, Any]]:
     ]
 
 
-def _hydrate_from_yfinance(symbol: str, cfg: dict[str, Any], payload: dict[str, Any]) -> None:
+def _from_yfinance(symbol: str, cfg: dict[str, Any], missing: set[str]) -> dict[str, Any]:
     period = cfg.get("period", "7d")
     interval = cfg.get("interval", "1h")
     history_window = cfg.get("history_window", 160)
     ticker = yf.Ticker(symbol)
-    history = ticker.history(period=period, interval=interval, actions=False)
+    history = cassette.call(
+        "yfinance.history",
+        (symbol, period, interval),
+        ticker.history,
+        period=period,
+        interval=interval,
+        actions=False,
+    )
     if history.empty:
         logger.warning("yfinance tidak mengembalikan data untuk %s", symbol)
-        return
+        return {}
     latest = history.iloc[-1]
-    payload.setdefault("symbol", symbol)
-    payload["price"] = float(latest["Close"])
-    payload["volume"] = float(latest["Volume"])
-    payload["timestamp"] = latest.name.to_pydatetime().replace(tzinfo=timezone.utc).isoformat()
-    payload["history"] = _build_history(history, history_window)
+    return {
+        "symbol": symbol,
+        "price": float(latest["Close"]),
+        "volume": float(latest["Volume"]),
+        "timestamp": latest.name.to_pydatetime().replace(tzinfo=timezone.utc).isoformat(),
+        "history": _build_history(history, history_window),
+    }
 
 
-def _hydrate_from_goapi(symbol: str, cfg: dict[str, Any], payload: dict[str, Any]) -> None:
+def _from_goapi(symbol: str, cfg: dict[str, Any], missing: set[str]) -> dict[str, Any]:
     # Load balance: ambil token berikutnya dari cycle
     token = next(_GOAPI_TOKEN_CYCLE, None)
     if not token:
         logger.info("Token GoAPI tidak diset. Lewati sumber GoAPI.")
-        return
+        return {}
     base_url = cfg.get("base_url", "https://api.goapi.id/v1/stock")
     headers = {cfg.get("auth_header", "X-API-KEY"): token}
     timeout = cfg.get("timeout", 8)
@@ -110,24 +132,167 @@ def _hydrate_from_goapi(symbol: str, cfg: dict[str, Any], payload: dict[str, Any
         response.raise_for_status()
         return response.json().get("data")
 
-    try:
+    payload: dict[str, Any] = {}
+    # Hanya minta endpoint yang datanya belum dimiliki sumber sebelumnya.
+    if "price" in missing:
         price_data = _request(cfg.get("price_endpoint", "idx/{symbol}"))
         if price_data:
-            payload.setdefault("symbol", symbol)
-            payload.setdefault("price", float(price_data.get("close", price_data.get("last_price", 0))))
-            payload.setdefault("volume", float(price_data.get("volume", 0)))
+            payload["symbol"] = symbol
+            payload["price"] = float(price_data.get("close", price_data.get("last_price", 0)))
+            payload["volume"] = float(price_data.get("volume", 0))
             ts = price_data.get("updated_at") or price_data.get("date")
             if ts:
                 payload["timestamp"] = ts
+    if "history" in missing:
         ohlcv_data = _request(cfg.get("ohlcv_endpoint", "idx/{symbol}/ohlcv/latest"))
-        if ohlcv_data and "history" not in payload:
+        if ohlcv_data:
+            payload.setdefault("symbol", symbol)
             payload["history"] = ohlcv_data
-    except requests.RequestException as exc:
-        logger.warning("Gagal mengambil data GoAPI untuk %s: %s", symbol, exc)
+    return payload
+
+
+_SOURCES: Dict[str, Callable[[str, dict[str, Any], set[str]], dict[str, Any]]] = {
+    "yfinance": _from_yfinance,
+    "goapi": _from_goapi,
+}
+# Sumber yang butuh kredensial; tanpa itu sumber tidak dipanggil (bukan dianggap gagal).
+_CONFIGURED: Dict[str, Callable[[], bool]] = {
+    "goapi": lambda: bool(_GOAPI_TOKENS),
+}
+_REQUIRED_FIELDS = {"price", "history"}
+_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="data-source")
+
+
+def _missing_fields(payload: dict[str, Any]) -> set[str]:
+    return {field for field in _REQUIRED_FIELDS if not payload.get(field)}
+
+
+def _merge_into(payload: dict[str, Any], partial: dict[str, Any]) -> None:
+    for key, value in partial.items():
+        if value and not payload.get(key):
+            payload[key] = value
+
+
+class IncompleteSourceResult(Exception):
+    """Probe tidak mendapat field yang diminta untuk simbol probe yang likuid."""
+
+
+def _require_fields(result: dict[str, Any], missing: set[str]) -> dict[str, Any]:
+    absent = {field for field in missing if not result.get(field)}
+    if absent:
+        raise IncompleteSourceResult(f"field {sorted(absent)} kosong")
+    return result
+
+
+def _call_source(
+    name: str,
+    symbol: str,
+    sources: dict[str, Any],
+    missing: set[str],
+) -> dict[str, Any]:
+    """Panggil satu sumber sambil mencatat health-nya; error tidak dilempar.
+
+    Hanya error transport/HTTP/parsing yang dihitung sebagai kegagalan breaker.
+    Data kosong untuk satu simbol (mis. saham suspend/delisting) tidak mengubah
+    health sumber, karena tidak menunjukkan sumbernya bermasalah.
+    """
+
+    source_cfg = sources.get(name, {})
+    cfg = source_cfg if isinstance(source_cfg, dict) else {}
+    breaker_cfg = sources.get("circuit_breaker", {})
+    fetcher = _SOURCES[name]
+    probe_symbol = breaker_cfg.get("probe_symbol", "BBCA.JK")
+    started = time.monotonic()
+    result: dict[str, Any] = {}
+    try:
+        result = fetcher(symbol, cfg, missing)
+    except Exception as exc:  # yfinance memunculkan Exception generic
+        logger.warning("Gagal mengambil data %s untuk %s: %s", name, symbol, exc)
+        source_health.record_failure(
+            name,
+            exc,
+            # Simbol probe selalu punya data; hasil kosong di sini berarti sumbernya bermasalah.
+            lambda: _require_fields(fetcher(probe_symbol, cfg, {"price"}), {"price"}),
+            breaker_cfg,
+        )
+        return {}
+    result = result or {}
+    if any(not result.get(field) for field in missing):
+        # Netral: tidak menambah kegagalan, juga tidak mereset hitungan.
+        logger.debug("Sumber %s tidak punya data lengkap untuk %s.", name, symbol)
+        return result
+    source_health.record_success(name, time.monotonic() - started, breaker_cfg)
+    return result
+
+
+def _active_sources(sources: dict[str, Any]) -> list[str]:
+    order = sources.get("order") or list(_SOURCES)
+    active = []
+    for name in order:
+        if name not in _SOURCES or not _is_enabled(sources.get(name, {})):
+            continue
+        if not _CONFIGURED.get(name, lambda: True)():
+            logger.debug("Sumber %s belum dikonfigurasi (token kosong). Dilewati.", name)
+            continue
+        if not source_health.allow(name):
+            logger.debug("Sumber %s dilewati (circuit breaker terbuka).", name)
+            continue
+        active.append(name)
+    return active
+
+
+def _fetch_priority(symbol: str, names: list[str], sources: dict[str, Any]) -> dict[str, Any]:
+    payload: dict[str, Any] = {}
+    for name in names:
+        _merge_into(payload, _call_source(name, symbol, sources, _missing_fields(payload)))
+        if not _missing_fields(payload):
+            break
+    return payload
+
+
+def _fetch_race(symbol: str, names: list[str], sources: dict[str, Any]) -> dict[str, Any]:
+    timeout = sources.get("race_timeout", 15)
+    futures = {
+        _EXECUTOR.submit(_call_source, name, symbol, sources, set(_REQUIRED_FIELDS)): name
+        for name in names
+    }
+    partials: dict[str, dict[str, Any]] = {}
+    try:
+        for future in as_completed(futures, timeout=timeout):
+            result = future.result()
+            if result and not _missing_fields(result):
+                logger.debug("Sumber %s memenangkan race untuk %s", futures[future], symbol)
+                return result
+            partials[futures[future]] = result
+    except FuturesTimeout:
+        logger.warning("Race sumber data untuk %s melewati %ss", symbol, timeout)
+    payload: dict[str, Any] = {}
+    for name in names:
+        _merge_into(payload, partials.get(name, {}))
+    return payload
+
+
+def _fetch_merge(symbol: str, names: list[str], sources: dict[str, Any]) -> dict[str, Any]:
+    futures = [
+        _EXECUTOR.submit(_call_source, name, symbol, sources, set(_REQUIRED_FIELDS))
+        for name in names
+    ]
+    payload: dict[str, Any] = {}
+    # Urutan prioritas tetap berlaku saat menggabungkan field.
+    for future in futures:
+        _merge_into(payload, future.result())
+    return payload
+
+
+_MODES = {
+    "priority": _fetch_priority,
+    "race": _fetch_race,
+    "merge": _fetch_merge,
+}
 
 
 def fetch_data(symbol: str, config: dict[str, Any]) -> Dict[str, Any] | None:
-    """Mengambil data harga dengan prioritas yfinance lalu GoAPI."""
+    """Mengambil data harga sesuai `data_sources.mode` (priority/race/merge)."""
 
     symbol = symbol.upper()
     sources = config.get("data_sources", {})
@@ -160,17 +325,12 @@ def fetch_data(symbol: str, config: dict[str, Any]) -> Dict[str, Any] | None:
         _write_cache(symbol, payload)
         return payload
 
-    payload: Dict[str, Any] = {}
-    yfinance_cfg = sources.get("yfinance", {})
-    if _is_enabled(yfinance_cfg):
-        try:
-            _hydrate_from_yfinance(symbol, yfinance_cfg if isinstance(yfinance_cfg, dict) else {}, payload)
-        except Exception as exc:  # yfinance memunculkan Exception generic
-            logger.warning("Gagal mengambil data yfinance untuk %s: %s", symbol, exc)
-
-    goapi_cfg = sources.get("goapi", {})
-    if _is_enabled(goapi_cfg):
-        _hydrate_from_goapi(symbol, goapi_cfg if isinstance(goapi_cfg, dict) else {}, payload)
+    mode = sources.get("mode", "priority")
+    strategy = _MODES.get(mode)
+    if strategy is None:
+        logger.warning("Mode sumber data %s tidak dikenal. Menggunakan priority.", mode)
+        strategy = _fetch_priority
+    payload = strategy(symbol, _active_sources(sources), sources)
 
     if not payload:
         logger.error("Tidak ada data pasar untuk %s", symbol)
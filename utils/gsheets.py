@@ -6,6 +6,7 @@ import csv
 import json
 import logging
 import os
+import threading
 from datetime import datetime, timezone
 from functools import lru_cache
 from pathlib import Path
@@ -17,17 +18,20 @@ from oauth2client.service_account import ServiceAccountCredentials
 logger = logging.getLogger(__name__)
 
 LOCAL_LOG = Path("data/signal_log.csv")
+# Beberapa worker sink bisa mencatat bersamaan; cek header dan append harus atomik.
+_LOCAL_LOG_LOCK = threading.Lock()
 
 
 def _ensure_local_log(row: List[Any]) -> None:
     header = ["timestamp", "symbol", "entry", "tp", "sl", "strategy", "comment"]
-    file_exists = LOCAL_LOG.exists()
-    LOCAL_LOG.parent.mkdir(parents=True, exist_ok=True)
-    with LOCAL_LOG.open("a", newline="", encoding="utf-8") as handle:
-        writer = csv.writer(handle)
-        if not file_exists:
-            writer.writerow(header)
-        writer.writerow(row)
+    with _LOCAL_LOG_LOCK:
+        file_exists = LOCAL_LOG.exists()
+        LOCAL_LOG.parent.mkdir(parents=True, exist_ok=True)
+        with LOCAL_LOG.open("a", newline="", encoding="utf-8") as handle:
+            writer = csv.writer(handle)
+            if not file_exists:
+                writer.writerow(header)
+            writer.writerow(row)
 
 
 def _get_credentials(config: dict) -> ServiceAccountCredentials | None:
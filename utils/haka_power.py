@@ -1,15 +1,34 @@
-"""Modul HAKA Power: running trade/momentum IDX."""
+"""Modul HAKA Power: running trade/momentum IDX.
+
+Running trade di-ingest inkremental selama jam sesi: cursor per simbol
+memastikan hanya trade baru yang diproses, lalu nilai buy/sell diagregasi ke
+bucket per menit (ring buffer `array`). Query momentum untuk window N menit
+terakhir cukup menjumlah N bucket.
+"""
 
 import os
 import logging
+import threading
+import time
+from array import array
+from datetime import date, datetime
+from datetime import time as dt_time
+from zoneinfo import ZoneInfo
+
 import requests
 
+from utils import market_calendar
+
 logger = logging.getLogger(__name__)
 
 GOAPI_HAKA_ENDPOINT = "idx/{symbol}/running-trade"
+BUCKET_CAPACITY = 480  # menit; cukup untuk satu hari sesi IDX
+
+_BUCKETS: dict = {}
+_LOCK = threading.Lock()
 
 
-def fetch_haka_power(symbol: str, config: dict) -> dict | None:
+def _request_running_trade(symbol: str, config: dict, params: dict | None = None) -> dict | None:
     goapi_cfg = config.get("data_sources", {}).get("goapi", {})
     token = os.getenv(goapi_cfg.get("token_env", "GOAPI_TOKEN_1")) or os.getenv("GOAPI_TOKEN_1") or os.getenv("GOAPI_TOKEN_2") or goapi_cfg.get("token")
     if not token:
@@ -20,7 +39,7 @@ def fetch_haka_power(symbol: str, config: dict) -> dict | None:
     timeout = goapi_cfg.get("timeout", 8)
     url = f"{base_url}/{GOAPI_HAKA_ENDPOINT.format(symbol=symbol)}"
     try:
-        response = requests.get(url, headers=headers, timeout=timeout)
+        response = requests.get(url, headers=headers, params=params, timeout=timeout)
         response.raise_for_status()
         return response.json().get("data")
     except requests.RequestException as exc:
@@ -28,15 +47,136 @@ def fetch_haka_power(symbol: str, config: dict) -> dict | None:
         return None
 
 
-def analyze_haka(data: dict) -> dict:
-    """
-    Analisa sederhana: deteksi momentum beli/jual dari running trade.
-    """
-    if not data or "trades" not in data:
-        return {"momentum": "Netral", "power": 0}
-    trades = data["trades"]
-    buy_power = sum(t["buy_value"] for t in trades if t["type"] == "buy")
-    sell_power = sum(t["sell_value"] for t in trades if t["type"] == "sell")
-    power = buy_power - sell_power
+def _trade_value(trade: dict) -> tuple[float, float]:
+    if trade.get("type") == "buy":
+        return float(trade.get("buy_value", 0)), 0.0
+    if trade.get("type") == "sell":
+        return 0.0, float(trade.get("sell_value", 0))
+    return 0.0, 0.0
+
+
+def _momentum(power: float) -> dict:
     momentum = "HAKA BUY" if power > 0 else ("HAKA SELL" if power < 0 else "Netral")
     return {"momentum": momentum, "power": power}
+
+
+class _MinuteBuckets:
+    """Ring buffer nilai buy/sell per menit untuk satu simbol."""
+
+    def __init__(self, session: date, capacity: int = BUCKET_CAPACITY) -> None:
+        # Cursor & bucket hanya berlaku untuk satu tanggal bursa.
+        self.session = session
+        self.capacity = capacity
+        self.minutes = array("q", [-1] * capacity)
+        self.buy = array("d", [0.0] * capacity)
+        self.sell = array("d", [0.0] * capacity)
+        self.cursor = None
+
+    def add(self, minute: int, buy: float, sell: float) -> None:
+        slot = minute % self.capacity
+        if self.minutes[slot] != minute:
+            self.minutes[slot] = minute
+            self.buy[slot] = 0.0
+            self.sell[slot] = 0.0
+        self.buy[slot] += buy
+        self.sell[slot] += sell
+
+    def window(self, end_minute: int, length: int) -> tuple[float, float]:
+        buy = sell = 0.0
+        for minute in range(end_minute - min(length, self.capacity) + 1, end_minute + 1):
+            slot = minute % self.capacity
+            if self.minutes[slot] == minute:
+                buy += self.buy[slot]
+                sell += self.sell[slot]
+        return buy, sell
+
+
+def _trade_key(trade: dict):
+    return trade.get("id") or trade.get("time") or trade.get("timestamp")
+
+
+def _is_after(key, cursor) -> bool:
+    try:
+        return float(key) > float(cursor)
+    except (TypeError, ValueError):
+        return str(key) > str(cursor)
+
+
+def _trade_minute(trade: dict, session: date) -> int | None:
+    """Menit epoch trade; jam saja ("HH:MM:SS") dianggap milik `session`. None bila tidak terbaca."""
+
+    raw = trade.get("timestamp") or trade.get("time")
+    if raw is None or raw == "":
+        return None
+    try:
+        if isinstance(raw, (int, float)):
+            return int(raw) // 60
+        text = str(raw)
+        if "T" in text or "-" in text:
+            parsed = datetime.fromisoformat(text)
+        else:
+            parsed = datetime.combine(session, dt_time.fromisoformat(text))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=ZoneInfo("Asia/Jakarta"))
+    return int(parsed.timestamp()) // 60
+
+
+def ingest_running_trade(symbol: str, config: dict) -> int:
+    """Ambil trade baru sejak cursor terakhir dan masukkan ke bucket. Mengembalikan jumlah trade baru."""
+
+    # Di luar sesi feed masih berisi trade sesi sebelumnya (jam saja, mis. "15:58:xx");
+    # bila di-ingest, trade itu dianggap milik hari ini dan cursor melompati sesi berjalan.
+    if not market_calendar.is_session_open(datetime.now(market_calendar.IDX_TIMEZONE), config):
+        return 0
+    cursor_param = config.get("haka", {}).get("cursor_param")
+    session = market_calendar.today()
+    with _LOCK:
+        existing = _BUCKETS.get(symbol)
+        if existing is not None and existing.session != session:
+            # Sesi baru: key jam-saja hari ini tidak sebanding dengan cursor kemarin.
+            del _BUCKETS[symbol]
+            existing = None
+        cursor = existing.cursor if existing else None
+    params = {cursor_param: cursor} if cursor_param and cursor is not None else None
+    data = _request_running_trade(symbol, config, params=params)
+    if not data or "trades" not in data:
+        return 0
+
+    added = skipped = 0
+    with _LOCK:
+        buckets = _BUCKETS.get(symbol)
+        if buckets is None or buckets.session != session:
+            buckets = _BUCKETS[symbol] = _MinuteBuckets(session)
+        latest = buckets.cursor
+        for trade in data["trades"]:
+            key = _trade_key(trade)
+            # Endpoint tanpa dukungan cursor tetap mengembalikan trade lama; saring di sini.
+            if key is not None and buckets.cursor is not None and not _is_after(key, buckets.cursor):
+                continue
+            minute = _trade_minute(trade, session)
+            if minute is None:
+                # Tidak dibucket ke menit sekarang dan tidak menggeser cursor.
+                skipped += 1
+                continue
+            buy, sell = _trade_value(trade)
+            buckets.add(minute, buy, sell)
+            added += 1
+            if key is not None and (latest is None or _is_after(key, latest)):
+                latest = key
+        buckets.cursor = latest
+    if skipped:
+        logger.debug("%d trade %s tanpa waktu valid dilewati.", skipped, symbol)
+    return added
+
+
+def haka_momentum(symbol: str, minutes: int = 30) -> dict | None:
+    """Momentum HAKA `minutes` menit terakhir dari bucket; None jika belum pernah di-ingest."""
+
+    with _LOCK:
+        buckets = _BUCKETS.get(symbol)
+        if buckets is None or buckets.session != market_calendar.today():
+            return None
+        buy, sell = buckets.window(int(time.time()) // 60, minutes)
+    return _momentum(buy - sell)
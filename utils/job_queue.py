@@ -0,0 +1,189 @@
+"""Antrian shard watchlist berbasis SQLite untuk eksekusi multi-worker.
+
+Coordinator memecah watchlist menjadi shard lalu menyimpannya di file SQLite
+lokal. Worker (proses lokal maupun container lain yang memakai volume `data/`
+yang sama) meng-klaim shard satu per satu, menjalankan strategi, dan menulis
+hasilnya kembali sebagai JSON agar coordinator dapat menggabungkannya.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Sequence
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_PATH = "data/job_queue.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    config TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS shards (
+    job_id TEXT NOT NULL,
+    shard_id INTEGER NOT NULL,
+    symbols TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    claimed_at REAL,
+    finished_at REAL,
+    result TEXT,
+    PRIMARY KEY (job_id, shard_id)
+);
+CREATE INDEX IF NOT EXISTS idx_shards_status ON shards (status, job_id);
+"""
+
+
+def queue_path(config: dict) -> str:
+    return config.get("workers", {}).get("queue_path", DEFAULT_QUEUE_PATH)
+
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def split_shards(symbols: Sequence[str], shard_size: int) -> List[List[str]]:
+    size = max(int(shard_size), 1)
+    return [list(symbols[i:i + size]) for i in range(0, len(symbols), size)]
+
+
+def enqueue_job(path: str, symbols: Sequence[str], config: dict, shard_size: int) -> str:
+    """Daftarkan job baru beserta shard-nya, kembalikan job_id."""
+
+    job_id = uuid.uuid4().hex
+    shards = split_shards(symbols, shard_size)
+    conn = _connect(path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(
+            "INSERT INTO jobs (job_id, config, created_at) VALUES (?, ?, ?)",
+            (job_id, json.dumps(config, default=str), time.time()),
+        )
+        conn.executemany(
+            "INSERT INTO shards (job_id, shard_id, symbols) VALUES (?, ?, ?)",
+            [(job_id, idx, json.dumps(shard)) for idx, shard in enumerate(shards)],
+        )
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+    logger.info("Job %s di-antrikan: %d simbol dalam %d shard", job_id, len(symbols), len(shards))
+    return job_id
+
+
+def claim_shard(path: str, lease_seconds: float, job_id: str | None = None) -> Dict[str, Any] | None:
+    """Klaim satu shard pending (atau shard running yang lease-nya kadaluarsa)."""
+
+    now = time.time()
+    conn = _connect(path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        query = (
+            "SELECT s.job_id, s.shard_id, s.symbols, j.config FROM shards s "
+            "JOIN jobs j ON j.job_id = s.job_id "
+            "WHERE (s.status = 'pending' OR (s.status = 'running' AND s.claimed_at < ?))"
+        )
+        params: list[Any] = [now - lease_seconds]
+        if job_id:
+            query += " AND s.job_id = ?"
+            params.append(job_id)
+        query += " ORDER BY j.created_at, s.shard_id LIMIT 1"
+        row = conn.execute(query, params).fetchone()
+        if not row:
+            conn.execute("COMMIT")
+            return None
+        worker = worker_name()
+        conn.execute(
+            "UPDATE shards SET status = 'running', worker = ?, claimed_at = ? WHERE job_id = ? AND shard_id = ?",
+            (worker, now, row[0], row[1]),
+        )
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+    return {
+        "job_id": row[0],
+        "shard_id": row[1],
+        "symbols": json.loads(row[2]),
+        "config": json.loads(row[3]),
+        "worker": worker,
+        "claimed_at": now,
+    }
+
+
+def complete_shard(path: str, shard: Dict[str, Any], result: Dict[str, Any]) -> bool:
+    """Simpan hasil shard hanya jika lease masih milik pemanggil (belum di-klaim ulang)."""
+
+    conn = _connect(path)
+    try:
+        cursor = conn.execute(
+            "UPDATE shards SET status = 'done', finished_at = ?, result = ? "
+            "WHERE job_id = ? AND shard_id = ? AND status = 'running' AND worker = ? AND claimed_at = ?",
+            (
+                time.time(),
+                json.dumps(result, default=str),
+                shard["job_id"],
+                shard["shard_id"],
+                shard["worker"],
+                shard["claimed_at"],
+            ),
+        )
+    finally:
+        conn.close()
+    if cursor.rowcount != 1:
+        logger.warning(
+            "Lease shard %s/%s sudah diambil worker lain; hasil dibuang.", shard["job_id"][:8], shard["shard_id"]
+        )
+        return False
+    return True
+
+
+def pending_count(path: str, job_id: str) -> int:
+    conn = _connect(path)
+    try:
+        row = conn.execute(
+            "SELECT COUNT(*) FROM shards WHERE job_id = ? AND status != 'done'", (job_id,)
+        ).fetchone()
+    finally:
+        conn.close()
+    return int(row[0])
+
+
+def collect_results(path: str, job_id: str) -> List[Dict[str, Any]]:
+    """Ambil hasil shard yang selesai, urut sesuai urutan shard."""
+
+    conn = _connect(path)
+    try:
+        rows = conn.execute(
+            "SELECT result FROM shards WHERE job_id = ? AND status = 'done' ORDER BY shard_id",
+            (job_id,),
+        ).fetchall()
+    finally:
+        conn.close()
+    return [json.loads(row[0]) for row in rows if row[0]]
+
+
+def purge_job(path: str, job_id: str) -> None:
+    conn = _connect(path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("DELETE FROM shards WHERE job_id = ?", (job_id,))
+        conn.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
@@ -0,0 +1,172 @@
+"""Engine level support/resistance multi-level berbasis pivot.
+
+Pivot high/low dideteksi secara vektor (rolling extrema dengan
+`sliding_window_view`), lalu dikelompokkan berdasarkan jarak harga menjadi
+level dengan jumlah sentuhan. Level disimpan per simbol di
+`levels.store_dir` dan diperbarui inkremental: hanya bar setelah pivot
+terakhir yang terkonfirmasi yang dipindai ulang. Query level terdekat memakai
+`bisect` pada daftar harga yang terurut.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import threading
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_DIR = "data/levels"
+
+_LEVELS: Dict[str, Dict[str, Any]] = {}
+_LOCK = threading.Lock()
+
+
+def _levels_cfg(config: dict) -> dict[str, Any]:
+    return config.get("levels", {})
+
+
+def _store_path(key: str, config: dict) -> Path:
+    return Path(_levels_cfg(config).get("store_dir", DEFAULT_STORE_DIR)) / f"{key}.json"
+
+
+def _empty_state() -> Dict[str, Any]:
+    return {"last_confirmed": None, "levels": []}
+
+
+def _load(key: str, config: dict) -> Dict[str, Any]:
+    state = _LEVELS.get(key)
+    if state is not None:
+        return state
+    path = _store_path(key, config)
+    if path.exists():
+        with path.open("r", encoding="utf-8") as handle:
+            state = json.load(handle)
+    else:
+        state = _empty_state()
+    _LEVELS[key] = state
+    return state
+
+
+def _save(key: str, state: Dict[str, Any], config: dict) -> None:
+    path = _store_path(key, config)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Tulis ke file sementara lalu ganti, agar crash di tengah penulisan tidak meninggalkan JSON terpotong.
+    tmp_path = path.with_suffix(".tmp")
+    with tmp_path.open("w", encoding="utf-8") as handle:
+        json.dump(state, handle)
+    tmp_path.replace(path)
+
+
+def find_pivots(high: np.ndarray, low: np.ndarray, order: int) -> tuple[np.ndarray, np.ndarray]:
+    """Indeks pivot high/low: bar yang menjadi ekstrem di window `order` bar kiri-kanan.
+
+    Ekstrem harus tegas terhadap bar kiri sehingga plateau harga yang sama
+    hanya menghasilkan satu pivot (bar pertama), bukan satu pivot per bar.
+    """
+
+    size = 2 * order + 1
+    if len(high) < size:
+        return np.array([], dtype=int), np.array([], dtype=int)
+    high_windows = sliding_window_view(high, size)
+    low_windows = sliding_window_view(low, size)
+    left_max = high_windows[:, :order].max(axis=1, initial=-np.inf)
+    left_min = low_windows[:, :order].min(axis=1, initial=np.inf)
+    center_high = high[order:len(high) - order]
+    center_low = low[order:len(low) - order]
+    pivot_high = np.flatnonzero((center_high >= high_windows.max(axis=1)) & (center_high > left_max)) + order
+    pivot_low = np.flatnonzero((center_low <= low_windows.min(axis=1)) & (center_low < left_min)) + order
+    return pivot_high, pivot_low
+
+
+def _merge_pivot(levels: List[Dict[str, Any]], price: float, kind: str, timestamp: str, tolerance: float) -> None:
+    """Gabungkan satu pivot ke level terdekat (dalam toleransi) atau buat level baru."""
+
+    prices = [level["price"] for level in levels]
+    idx = bisect_left(prices, price)
+    best = None
+    for candidate in (idx - 1, idx):
+        if 0 <= candidate < len(levels):
+            distance = abs(levels[candidate]["price"] - price) / price
+            if distance <= tolerance and (best is None or distance < best[1]):
+                best = (candidate, distance)
+    if best is None:
+        levels.insert(idx, {"price": price, "touches": 1, "kinds": [kind], "last_touch": timestamp})
+        return
+    level = levels[best[0]]
+    touches = level["touches"]
+    # Harga level = rata-rata tertimbang sentuhan.
+    level["price"] = (level["price"] * touches + price) / (touches + 1)
+    level["touches"] = touches + 1
+    if kind not in level["kinds"]:
+        level["kinds"].append(kind)
+    level["last_touch"] = max(level["last_touch"], timestamp)
+    levels.sort(key=lambda item: item["price"])
+
+
+def level_key(symbol: str, timeframe: str | None = None) -> str:
+    """Level per timeframe disimpan terpisah agar pivot 1h dan 1d tidak tercampur."""
+
+    return f"{symbol}_{timeframe.lower()}" if timeframe else symbol
+
+
+def update_levels(key: str, history: List[Dict[str, Any]], config: dict) -> List[Dict[str, Any]]:
+    """Pindai bar baru sejak pivot terakhir yang terkonfirmasi dan perbarui level `key`."""
+
+    cfg = _levels_cfg(config)
+    order = int(cfg.get("pivot_order", 3))
+    tolerance = float(cfg.get("cluster_tolerance", 0.01))
+    max_levels = int(cfg.get("max_levels", 40))
+
+    with _LOCK:
+        state = _load(key, config)
+        bars = sorted(history, key=lambda bar: str(bar["timestamp"]))
+        timestamps = [str(bar["timestamp"]) for bar in bars]
+        last_confirmed = state["last_confirmed"]
+        # Bar sebelum `order` bar sebelum batas konfirmasi sudah pernah dipindai.
+        start = 0
+        if last_confirmed is not None:
+            start = max(bisect_right(timestamps, last_confirmed) - order, 0)
+        window = bars[start:]
+        if len(window) < 2 * order + 1:
+            return state["levels"]
+
+        high = np.fromiter((float(bar["high"]) for bar in window), dtype=float, count=len(window))
+        low = np.fromiter((float(bar["low"]) for bar in window), dtype=float, count=len(window))
+        pivot_high, pivot_low = find_pivots(high, low, order)
+        # Gabungkan pivot secara kronologis agar hasil inkremental sama dengan rebuild penuh.
+        pivots = sorted(
+            [(int(i), "resistance", float(high[i])) for i in pivot_high]
+            + [(int(i), "support", float(low[i])) for i in pivot_low]
+        )
+        for index, kind, price in pivots:
+            ts = timestamps[start + index]
+            if last_confirmed is not None and ts <= last_confirmed:
+                continue
+            _merge_pivot(state["levels"], price, kind, ts, tolerance)
+
+        # Pivot hanya terkonfirmasi bila sudah ada `order` bar setelahnya.
+        state["last_confirmed"] = timestamps[len(bars) - order - 1]
+        if len(state["levels"]) > max_levels:
+            strongest = sorted(state["levels"], key=lambda lv: (lv["touches"], lv["last_touch"]), reverse=True)
+            state["levels"] = sorted(strongest[:max_levels], key=lambda lv: lv["price"])
+        _save(key, state, config)
+        return state["levels"]
+
+
+def nearest_levels(key: str, price: float, config: dict, min_touches: int = 1) -> Dict[str, Dict[str, Any] | None]:
+    """Support terdekat di bawah dan resistance terdekat di atas `price` (bisect O(log n))."""
+
+    with _LOCK:
+        levels = [lv for lv in _load(key, config)["levels"] if lv["touches"] >= min_touches]
+    prices = [level["price"] for level in levels]
+    idx = bisect_right(prices, price)
+    support = levels[idx - 1] if idx > 0 else None
+    resistance = levels[idx] if idx < len(levels) else None
+    return {"support": support, "resistance": resistance}
@@ -0,0 +1,81 @@
+"""Kalender bursa IDX: hari libur, half day, dan filter job terjadwal."""
+
+from __future__ import annotations
+
+import logging
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from typing import Iterable
+from zoneinfo import ZoneInfo
+
+logger = logging.getLogger(__name__)
+
+IDX_TIMEZONE = ZoneInfo("Asia/Jakarta")
+
+
+@lru_cache(maxsize=8)
+def _parse_dates(values: tuple[str, ...]) -> frozenset[date]:
+    parsed = set()
+    for value in values:
+        try:
+            parsed.add(date.fromisoformat(str(value)))
+        except ValueError:
+            logger.warning("Tanggal kalender IDX tidak valid: %s", value)
+    return frozenset(parsed)
+
+
+def _dates(config: dict, key: str) -> frozenset[date]:
+    values: Iterable[str] = config.get("market_calendar", {}).get(key) or []
+    return _parse_dates(tuple(str(value) for value in values))
+
+
+def today() -> date:
+    return datetime.now(IDX_TIMEZONE).date()
+
+
+def is_trading_day(day: date, config: dict) -> bool:
+    return day.weekday() < 5 and day not in _dates(config, "holidays")
+
+
+def is_half_day(day: date, config: dict) -> bool:
+    return day in _dates(config, "half_days")
+
+
+def is_session_open(now: datetime, config: dict) -> bool:
+    """True jika `now` berada di jam sesi bursa (`market_calendar.session`)."""
+
+    local = now.astimezone(IDX_TIMEZONE)
+    if not is_trading_day(local.date(), config):
+        return False
+    session = config.get("market_calendar", {}).get("session", {})
+    opens = time.fromisoformat(session.get("open", "09:00"))
+    closes = time.fromisoformat(session.get("close", "16:00"))
+    if is_half_day(local.date(), config):
+        closes = time.fromisoformat(session.get("half_day_close", "12:00"))
+    return opens <= local.time() <= closes
+
+
+def last_trading_day(now: datetime, config: dict) -> date:
+    """Hari bursa terakhir yang sesinya sudah dibuka pada `now` (akhir pekan/libur/pra-buka mundur)."""
+
+    local = now.astimezone(IDX_TIMEZONE)
+    opens = time.fromisoformat(config.get("market_calendar", {}).get("session", {}).get("open", "09:00"))
+    day = local.date()
+    if local.time() < opens:
+        day -= timedelta(days=1)
+    while not is_trading_day(day, config):
+        day -= timedelta(days=1)
+    return day
+
+
+def should_run(style: str, day: date, config: dict) -> bool:
+    """Apakah job `style` layak dijalankan pada `day` menurut kalender IDX."""
+
+    if not is_trading_day(day, config):
+        logger.info("%s bukan hari bursa IDX. Job %s dilewati.", day.isoformat(), style)
+        return False
+    skip_styles = {s.upper() for s in config.get("market_calendar", {}).get("skip_on_half_day", [])}
+    if is_half_day(day, config) and style.upper() in skip_styles:
+        logger.info("%s adalah half day IDX. Job %s dilewati.", day.isoformat(), style)
+        return False
+    return True
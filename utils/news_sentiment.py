@@ -1,8 +1,20 @@
-"""Modul news sentiment & corporate action IDX."""
+"""Modul news sentiment & corporate action IDX.
+
+Sentimen dihitung dari seluruh judul berita memakai satu regex gabungan dari
+lexicon berbobot (`news_sentiment.lexicon`). Skor per judul di-cache sehingga
+judul yang sama tidak dinilai ulang, dan request berita memakai ETag /
+If-Modified-Since bila endpoint mendukung.
+"""
 
 import requests
 import logging
 import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from utils import cache
 
 logger = logging.getLogger(__name__)
 
@@ -10,31 +22,140 @@ IDX_NEWS_API = "https://www.idx.co.id/umbraco/api/News/GetNewsByStockCode?stockC
 CORP_ACTION_API = "https://api.goapi.id/v1/stock/idx/{symbol}/corporate-action"  # GoAPI
 
 
-def fetch_news_sentiment(symbol: str) -> dict:
-    """Ambil berita terbaru dan analisa sentimen sederhana."""
+DEFAULT_LEXICON = {
+    "dividen": 2.0,
+    "naik": 1.0,
+    "laba": 2.0,
+    "akumulasi": 1.0,
+    "rugi": -2.0,
+    "turun": -1.0,
+    "right issue": -1.0,
+    "dilusi": -2.0,
+}
+
+_SESSION = requests.Session()
+# url -> (etag, last_modified, body) untuk conditional request
+_VALIDATORS: dict = {}
+# lexicon key -> {judul ternormalisasi: skor}
+_HEADLINE_SCORES: dict = {}
+_LOCK = threading.Lock()
+
+
+def _news_cfg(config: dict | None) -> dict:
+    return (config or {}).get("news_sentiment", {})
+
+
+def _lexicon(config: dict | None) -> tuple:
+    lexicon = _news_cfg(config).get("lexicon") or DEFAULT_LEXICON
+    return tuple(sorted((str(word).lower(), float(weight)) for word, weight in lexicon.items()))
+
+
+@lru_cache(maxsize=4)
+def _matcher(lexicon: tuple) -> re.Pattern:
+    # Frasa terpanjang didahulukan agar "right issue" tidak kalah oleh kata pendek.
+    # Tanpa word boundary supaya imbuhan (kenaikan, penurunan) tetap cocok.
+    words = sorted((word for word, _ in lexicon), key=len, reverse=True)
+    return re.compile("|".join(re.escape(word) for word in words), re.IGNORECASE)
+
+
+def score_headline(title: str, config: dict | None = None) -> float:
+    """Skor satu judul: jumlah bobot semua kata lexicon yang muncul (di-cache per judul)."""
+
+    lexicon = _lexicon(config)
+    key = " ".join(title.lower().split())
+    with _LOCK:
+        scores = _HEADLINE_SCORES.setdefault(lexicon, {})
+        if key in scores:
+            return scores[key]
+    weights = dict(lexicon)
+    score = sum((weights[match.group(0)] for match in _matcher(lexicon).finditer(key)), 0.0)
+    with _LOCK:
+        scores[key] = score
+    return score
+
+
+def _get_news(symbol: str) -> list:
+    """GET berita dengan ETag/If-Modified-Since; 304 memakai body sebelumnya."""
+
+    url = IDX_NEWS_API.format(symbol=symbol.replace('.JK', ''))
+    with _LOCK:
+        etag, last_modified, body = _VALIDATORS.get(url, (None, None, None))
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    resp = _SESSION.get(url, headers=headers, timeout=8)
+    if resp.status_code == 304 and body is not None:
+        return body
+    resp.raise_for_status()
+    news = resp.json()
+    etag = resp.headers.get("ETag")
+    last_modified = resp.headers.get("Last-Modified")
+    if etag or last_modified:
+        with _LOCK:
+            _VALIDATORS[url] = (etag, last_modified, news)
+    return news
+
+
+def _analyze(symbol: str, config: dict | None) -> dict:
+    cfg = _news_cfg(config)
     try:
-        url = IDX_NEWS_API.format(symbol=symbol.replace('.JK', ''))
-        resp = requests.get(url, timeout=8)
-        resp.raise_for_status()
-        news = resp.json()
-        # Dummy sentiment: positif jika ada kata 'dividen', 'naik', negatif jika 'rugi', 'turun'
-        sentiment = "Netral"
-        for item in news:
-            title = item.get("Title", "").lower()
-            if any(word in title for word in ["dividen", "naik", "laba", "akumulasi"]):
-                sentiment = "Positif"
-                break
-            if any(word in title for word in ["rugi", "turun", "right issue", "dilusi"]):
-                sentiment = "Negatif"
-                break
-        return {"sentiment": sentiment, "news": news[:3]}
+        news = _get_news(symbol)
+        if not isinstance(news, list) or not all(isinstance(item, dict) for item in news):
+            raise ValueError(f"format berita tidak dikenal ({type(news).__name__})")
+        score = sum(score_headline(str(item.get("Title") or ""), config) for item in news)
     except Exception as exc:
         logger.warning("Gagal ambil news sentiment %s: %s", symbol, exc)
-        return {"sentiment": "Netral", "news": []}
+        # Hasil gagal ikut di-cache agar enrichment tiap sinyal tidak mengulang request.
+        result = {"sentiment": "Netral", "score": 0.0, "news": []}
+        cache.write("news_sentiment", symbol, result)
+        return result
+    if score >= float(cfg.get("positive_threshold", 1.0)):
+        sentiment = "Positif"
+    elif score <= float(cfg.get("negative_threshold", -1.0)):
+        sentiment = "Negatif"
+    else:
+        sentiment = "Netral"
+    result = {"sentiment": sentiment, "score": score, "news": news[:3]}
+    cache.write("news_sentiment", symbol, result)
+    return result
+
+
+def refresh_sentiment(symbols: list, config: dict | None = None, force: bool = False) -> dict:
+    """Prekomputasi sentimen seluruh watchlist IDX dalam satu pass paralel."""
+
+    ttl = cache.enrichment_ttl(config)
+    results = {}
+    pending = []
+    for symbol in symbols:
+        if not symbol.endswith(".JK"):
+            continue
+        cached = None if force else cache.read("news_sentiment", symbol, ttl)
+        if cached is not None:
+            results[symbol] = cached
+        else:
+            pending.append(symbol)
+    if pending:
+        workers = int(_news_cfg(config).get("workers", 4))
+        with ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="news") as executor:
+            results.update(zip(pending, executor.map(lambda s: _analyze(s, config), pending)))
+    return results
+
+
+def fetch_news_sentiment(symbol: str, config: dict | None = None) -> dict:
+    """Sentimen berita terbaru; memakai hasil prekomputasi jika tersedia."""
+    cached = cache.read("news_sentiment", symbol, cache.enrichment_ttl(config))
+    if cached is not None:
+        return cached
+    return _analyze(symbol, config)
 
 
 def fetch_corporate_action(symbol: str, config: dict) -> dict:
     """Ambil corporate action terbaru via GoAPI."""
+    cached = cache.read("corporate_action", symbol, cache.enrichment_ttl(config))
+    if cached is not None:
+        return cached
     goapi_cfg = config.get("data_sources", {}).get("goapi", {})
     token = os.getenv(goapi_cfg.get("token_env", "GOAPI_TOKEN_1")) or os.getenv("GOAPI_TOKEN_1") or os.getenv("GOAPI_TOKEN_2") or goapi_cfg.get("token")
     if not token:
@@ -48,6 +169,7 @@ def fetch_corporate_action(symbol: str, config: dict) -> dict:
         resp = requests.get(url, headers=headers, timeout=timeout)
         resp.raise_for_status()
         data = resp.json().get("data", {})
+        cache.write("corporate_action", symbol, data)
         return data
     except Exception as exc:
         logger.warning("Gagal ambil corporate action %s: %s", symbol, exc)
@@ -0,0 +1,143 @@
+"""Pipeline producer/consumer bertahap dengan antrian terbatas.
+
+Setiap stage punya antrian `queue.Queue(maxsize)` dan jumlah worker thread
+sendiri. Stage yang penuh memblokir stage sebelumnya (backpressure) sehingga
+stage I/O (fetch, sink) dan stage CPU (strategi, chart) berjalan tumpang
+tindih tanpa menumpuk memori. `stop()` menghentikan input baru, tetapi item
+yang sudah masuk tetap dialirkan sampai sink selesai.
+"""
+
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+@dataclass
+class StageStats:
+    processed: int = 0
+    emitted: int = 0
+    errors: int = 0
+    busy_seconds: float = 0.0
+    max_depth: int = 0
+    started_at: float | None = None
+    finished_at: float | None = None
+
+    def summary(self) -> Dict[str, Any]:
+        elapsed = (self.finished_at or time.monotonic()) - (self.started_at or time.monotonic())
+        return {
+            "processed": self.processed,
+            "emitted": self.emitted,
+            "errors": self.errors,
+            "max_depth": self.max_depth,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "throughput_per_s": round(self.processed / elapsed, 2) if elapsed > 0 else None,
+        }
+
+
+@dataclass
+class Stage:
+    """`func(item)` mengembalikan iterable output (boleh kosong) untuk stage berikutnya."""
+
+    name: str
+    func: Callable[[Any], Iterable[Any]]
+    workers: int = 1
+    queue_size: int = 16
+    stats: StageStats = field(default_factory=StageStats)
+
+    def __post_init__(self) -> None:
+        self.queue: queue.Queue = queue.Queue(maxsize=max(int(self.queue_size), 1))
+        self._lock = threading.Lock()
+
+    def put(self, item: Any) -> None:
+        self.queue.put(item)
+        depth = self.queue.qsize()
+        with self._lock:
+            self.stats.max_depth = max(self.stats.max_depth, depth)
+
+
+class Pipeline:
+    def __init__(self, name: str, stages: List[Stage], report_interval: float = 0.0) -> None:
+        self.name = name
+        self.stages = stages
+        self.report_interval = report_interval
+        self._stopping = threading.Event()
+
+    def stop(self) -> None:
+        """Berhenti menerima input baru; item di dalam pipeline tetap diselesaikan."""
+        self._stopping.set()
+
+    def _worker(self, index: int) -> None:
+        stage = self.stages[index]
+        downstream = self.stages[index + 1] if index + 1 < len(self.stages) else None
+        while True:
+            item = stage.queue.get()
+            if item is _DONE:
+                return
+            started = time.perf_counter()
+            try:
+                outputs = list(stage.func(item) or ())
+            except Exception as exc:
+                logger.exception("Stage %s gagal memproses item: %s", stage.name, exc)
+                outputs = []
+                with stage._lock:
+                    stage.stats.errors += 1
+            with stage._lock:
+                stage.stats.processed += 1
+                stage.stats.emitted += len(outputs)
+                stage.stats.busy_seconds += time.perf_counter() - started
+            if downstream is not None:
+                for output in outputs:
+                    downstream.put(output)
+
+    def _report(self, finished: threading.Event) -> None:
+        while not finished.wait(self.report_interval):
+            depths = ", ".join(f"{s.name}={s.queue.qsize()}" for s in self.stages)
+            logger.info("Pipeline %s antrian: %s", self.name, depths)
+
+    def run(self, items: Iterable[Any]) -> Dict[str, Dict[str, Any]]:
+        threads: List[List[threading.Thread]] = []
+        for index, stage in enumerate(self.stages):
+            stage.stats.started_at = time.monotonic()
+            group = [
+                threading.Thread(target=self._worker, args=(index,), name=f"{stage.name}-{n}", daemon=True)
+                for n in range(max(int(stage.workers), 1))
+            ]
+            for thread in group:
+                thread.start()
+            threads.append(group)
+
+        finished = threading.Event()
+        reporter = None
+        if self.report_interval > 0:
+            reporter = threading.Thread(target=self._report, args=(finished,), daemon=True)
+            reporter.start()
+
+        try:
+            for item in items:
+                if self._stopping.is_set():
+                    logger.warning("Pipeline %s dihentikan; menguras item yang tersisa.", self.name)
+                    break
+                self.stages[0].put(item)
+        finally:
+            # Tutup stage satu per satu agar semua item hulu sudah diteruskan ke hilir.
+            for stage, group in zip(self.stages, threads):
+                for _ in group:
+                    stage.queue.put(_DONE)
+                for thread in group:
+                    thread.join()
+                stage.stats.finished_at = time.monotonic()
+            finished.set()
+
+        report = {stage.name: stage.stats.summary() for stage in self.stages}
+        for stage_name, summary in report.items():
+            logger.info("Pipeline %s stage %s: %s", self.name, stage_name, summary)
+        return report
@@ -0,0 +1,183 @@
+"""Risk pass portofolio untuk seluruh sinyal satu job.
+
+Berbeda dengan `utils.risk_management` yang bekerja per simbol lewat
+DataFrame, modul ini menyusun bar semua simbol kandidat ke matriks NumPy lalu
+menghitung ATR, stop berbasis ATR, ukuran posisi (modal x risk per trade,
+dibulatkan ke lot IDX 100 lembar), dan matriks korelasi return sekaligus.
+Sinyal searah pada simbol yang sangat berkorelasi ditandai (`flag`) atau
+dibuang (`trim`) sebelum dikirim ke Telegram.
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Any, Dict, List
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+IDX_LOT_SIZE = 100
+
+
+def _risk_cfg(config: dict) -> dict[str, Any]:
+    return config.get("portfolio_risk", {})
+
+
+def is_enabled(config: dict) -> bool:
+    return bool(_risk_cfg(config).get("enabled"))
+
+
+def _bars(signal: Dict[str, Any]) -> List[Dict[str, Any]]:
+    history = signal.get("data", {}).get("history") or []
+    return sorted(history, key=lambda bar: str(bar["timestamp"]))
+
+
+def _atr_matrix(bars: List[List[Dict[str, Any]]], period: int) -> np.ndarray:
+    """ATR (rata-rata true range `period` bar terakhir) untuk semua simbol sekaligus."""
+
+    atr = np.full(len(bars), np.nan)
+    ready = [i for i, rows in enumerate(bars) if len(rows) > period]
+    if not ready:
+        return atr
+    tail = [bars[i][-(period + 1):] for i in ready]
+    high = np.array([[float(bar["high"]) for bar in rows] for rows in tail])
+    low = np.array([[float(bar["low"]) for bar in rows] for rows in tail])
+    close = np.array([[float(bar["close"]) for bar in rows] for rows in tail])
+    prev_close = close[:, :-1]
+    true_range = np.maximum.reduce(
+        [
+            high[:, 1:] - low[:, 1:],
+            np.abs(high[:, 1:] - prev_close),
+            np.abs(low[:, 1:] - prev_close),
+        ]
+    )
+    atr[ready] = true_range.mean(axis=1)
+    return atr
+
+
+def _correlation_matrix(bars: List[List[Dict[str, Any]]], lookback: int, min_periods: int) -> np.ndarray:
+    """Korelasi log-return berpasangan pada grid timestamp gabungan.
+
+    Return yang tidak ada (simbol tanpa bar di timestamp itu) di-mask; setiap
+    pasangan hanya memakai return yang dimiliki keduanya, dihitung sekaligus
+    lewat perkalian matriks. Pasangan dengan overlap < `min_periods` dianggap 0.
+    """
+
+    n = len(bars)
+    if n < 2:
+        return np.eye(n)
+    grid = sorted(set().union(*({str(bar["timestamp"]) for bar in rows} for rows in bars)))[-(lookback + 1):]
+    column = {ts: index for index, ts in enumerate(grid)}
+    closes = np.full((n, len(grid)), np.nan)
+    for row, rows in enumerate(bars):
+        for bar in rows:
+            index = column.get(str(bar["timestamp"]))
+            if index is not None:
+                closes[row, index] = float(bar["close"])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        returns = np.diff(np.log(closes), axis=1)
+    valid = np.isfinite(returns).astype(float)
+    x = np.where(valid > 0, returns, 0.0)
+
+    count = valid @ valid.T
+    sum_x = x @ valid.T  # [i, j] = jumlah return i pada timestamp yang juga dimiliki j
+    sum_xx = (x * x) @ valid.T
+    sum_xy = x @ x.T
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cov = count * sum_xy - sum_x * sum_x.T
+        var = (count * sum_xx - sum_x**2) * (count * sum_xx - sum_x**2).T
+        corr = cov / np.sqrt(var)
+    # Return konstan atau overlap pendek menghasilkan korelasi tak bermakna; anggap 0.
+    corr = np.where((count >= min_periods) & np.isfinite(corr), corr, 0.0)
+    np.fill_diagonal(corr, 1.0)
+    return np.clip(corr, -1.0, 1.0)
+
+
+def assess_signals(signals: List[Dict[str, Any]], config: dict) -> List[Dict[str, Any]]:
+    """Tambahkan stop ATR + ukuran posisi dan tandai/buang sinyal yang terkorelasi tinggi."""
+
+    if not signals:
+        return signals
+    cfg = _risk_cfg(config)
+    capital = float(cfg.get("capital", 100_000_000))
+    risk_per_trade = float(cfg.get("risk_per_trade", 0.01))
+    atr_period = int(cfg.get("atr_period", 14))
+    atr_multiplier = float(cfg.get("atr_multiplier", 1.5))
+    max_position_pct = float(cfg.get("max_position_pct", 0.25))
+    max_correlation = float(cfg.get("max_correlation", 0.8))
+    lookback = int(cfg.get("correlation_lookback", 60))
+    min_periods = int(cfg.get("correlation_min_periods", 20))
+    action = str(cfg.get("action", "flag")).lower()
+
+    symbols = sorted({signal["symbol"] for signal in signals})
+    column = {symbol: index for index, symbol in enumerate(symbols)}
+    bars_by_symbol: Dict[str, List[Dict[str, Any]]] = {}
+    for signal in signals:
+        # Sinyal dari simbol yang sama memakai bar yang sama; ambil history terpanjang.
+        bars = _bars(signal)
+        if len(bars) > len(bars_by_symbol.get(signal["symbol"], [])):
+            bars_by_symbol[signal["symbol"]] = bars
+    bars = [bars_by_symbol.get(symbol, []) for symbol in symbols]
+    atr = _atr_matrix(bars, atr_period)
+    corr = _correlation_matrix(bars, lookback, min_periods)
+
+    entry = np.array([float(signal["entry"]) for signal in signals])
+    tp = np.array([float(signal["tp"]) for signal in signals])
+    sl = np.array([float(signal["sl"]) for signal in signals])
+    direction = np.where(tp >= entry, 1.0, -1.0)
+    signal_atr = atr[[column[signal["symbol"]] for signal in signals]]
+    # Tanpa ATR (history pendek), stop sinyal asli yang dipakai.
+    stop = np.where(np.isnan(signal_atr), sl, entry - direction * atr_multiplier * np.nan_to_num(signal_atr))
+    risk_per_share = np.abs(entry - stop)
+    lot = np.array([IDX_LOT_SIZE if signal["symbol"].endswith(".JK") else 1 for signal in signals])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        by_risk = np.where(risk_per_share > 0, capital * risk_per_trade / risk_per_share, 0.0)
+        reward_risk = np.where(risk_per_share > 0, np.abs(tp - entry) / risk_per_share, 0.0)
+    by_capital = capital * max_position_pct / entry
+    shares = np.floor(np.minimum(by_risk, by_capital) / lot) * lot
+
+    # Prioritaskan reward/risk terbaik; sinyal lain yang searah & berkorelasi tinggi dianggap duplikat.
+    accepted: List[int] = []
+    duplicates: Dict[int, tuple[int, float]] = {}
+    for i in np.argsort(-reward_risk, kind="stable"):
+        ci = column[signals[i]["symbol"]]
+        for j in accepted:
+            effective = corr[ci, column[signals[j]["symbol"]]] * direction[i] * direction[j]
+            if effective >= max_correlation:
+                duplicates[int(i)] = (j, float(effective))
+                break
+        else:
+            accepted.append(int(i))
+
+    assessed = []
+    for i, signal in enumerate(signals):
+        risk = {
+            "atr": None if np.isnan(signal_atr[i]) else round(float(signal_atr[i]), 4),
+            "stop": round(float(stop[i]), 4),
+            "shares": int(shares[i]),
+            "lots": int(shares[i] // lot[i]) if lot[i] > 1 else None,
+            "position_value": round(float(shares[i] * entry[i]), 2),
+            "risk_amount": round(float(shares[i] * risk_per_share[i]), 2),
+        }
+        comment = signal.get("comment", "")
+        size = f"{risk['lots']} lot" if risk["lots"] is not None else f"{risk['shares']} sh"
+        parts = [f"Risk: stop {risk['stop']} size {size}"]
+        if i in duplicates:
+            j, effective = duplicates[i]
+            if action == "trim":
+                logger.info(
+                    "Sinyal %s %s dibuang: korelasi %.2f dengan %s",
+                    signal["symbol"], signal.get("strategy"), effective, signals[j]["symbol"],
+                )
+                continue
+            risk["correlated_with"] = signals[j]["symbol"]
+            risk["correlation"] = round(effective, 3)
+            parts.append(f"⚠ Korelasi {effective:.2f} dgn {signals[j]['symbol']}")
+        assessed.append(
+            {**signal, "risk": risk, "comment": " | ".join([comment, *parts]) if comment else " | ".join(parts)}
+        )
+    logger.info(
+        "Risk portofolio: %d sinyal, %d duplikat terkorelasi (%s).", len(signals), len(duplicates), action
+    )
+    return assessed
@@ -0,0 +1,359 @@
+"""Tracker posisi terbuka dari sinyal yang sudah dikirim (TP/SL/trailing/expiry).
+
+Setiap siklus, harga semua simbol terbuka diambil dengan satu request bulk
+(GoAPI `prices`, fallback satu panggilan `yf.download`). Trailing stop
+diperbarui inkremental dan event TP/SL/expiry dikirim ke chat penerima sinyal
+(disimpan saat posisi dibuka) serta log sinyal.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import pandas as pd
+import requests
+import yfinance as yf
+
+from utils import cassette
+from utils.gsheets import log_signal
+from utils.risk_management import compute_atr, trailing_stop
+from utils.telegram import send_text
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE = "data/positions.json"
+
+_LOCK = threading.Lock()
+
+
+def _positions_cfg(config: dict) -> dict[str, Any]:
+    return config.get("positions", {})
+
+
+def _store_path(config: dict) -> Path:
+    return Path(_positions_cfg(config).get("store_path", DEFAULT_STORE))
+
+
+def _load(config: dict) -> Dict[str, Any]:
+    path = _store_path(config)
+    if not path.exists():
+        return {"last_poll": None, "positions": []}
+    with path.open("r", encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def _save(state: Dict[str, Any], config: dict) -> None:
+    path = _store_path(config)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with tmp_path.open("w", encoding="utf-8") as handle:
+        json.dump(state, handle, indent=1)
+    tmp_path.replace(path)
+
+
+def _direction(signal: Dict[str, Any]) -> str:
+    return "BUY" if float(signal["tp"]) >= float(signal["entry"]) else "SELL"
+
+
+def open_positions(
+    signals: List[Dict[str, Any]],
+    config: dict,
+    chat_ids_for: Callable[[Dict[str, Any]], List[str | None]] | None = None,
+) -> None:
+    """Catat posisi baru dari sinyal yang baru dikirim (satu posisi per simbol+strategi).
+
+    `chat_ids_for(signal)` memberi chat penerima sinyal; event posisi dikirim
+    ke chat yang sama. Tanpa itu, event ke chat default (`None`).
+    """
+
+    cfg = _positions_cfg(config)
+    max_age = timedelta(hours=float(cfg.get("max_age_hours", 72)))
+    atr_period = int(cfg.get("atr_period", 14))
+    now = datetime.now(timezone.utc)
+    with _LOCK:
+        state = _load(config)
+        open_keys = {(p["symbol"], p["strategy"]) for p in state["positions"]}
+        for signal in signals:
+            if not all(signal.get(key) is not None for key in ("symbol", "entry", "tp", "sl")):
+                continue
+            key = (signal["symbol"], signal.get("strategy"))
+            if key in open_keys:
+                continue
+            history = signal.get("data", {}).get("history") or []
+            chat_ids = list(dict.fromkeys(chat_ids_for(signal))) if chat_ids_for else [None]
+            state["positions"].append(
+                {
+                    "id": uuid.uuid4().hex[:12],
+                    "symbol": signal["symbol"],
+                    "strategy": signal.get("strategy"),
+                    "direction": _direction(signal),
+                    "entry": float(signal["entry"]),
+                    "tp": float(signal["tp"]),
+                    "sl": float(signal["sl"]),
+                    "stop": float(signal["sl"]),
+                    "atr": compute_atr(history, period=atr_period),
+                    "opened_at": now.isoformat(),
+                    "expires_at": (now + max_age).isoformat(),
+                    "chat_ids": chat_ids,
+                }
+            )
+            open_keys.add(key)
+        _save(state, config)
+
+
+def _goapi_bulk_bars(symbols: List[str], config: dict) -> Dict[str, pd.DataFrame]:
+    """Harga terakhir dari GoAPI `prices` sebagai satu bar per simbol.
+
+    High/low di endpoint ini mencakup seluruh sesi tanpa batas waktu, sehingga
+    hanya harga terakhir yang dipakai (high = low = close).
+    """
+
+    goapi_cfg = config.get("data_sources", {}).get("goapi", {})
+    token = os.getenv(goapi_cfg.get("token_env", "GOAPI_TOKEN_1")) or os.getenv("GOAPI_TOKEN_1") or os.getenv("GOAPI_TOKEN_2") or goapi_cfg.get("token")
+    if not token:
+        return {}
+    base_url = goapi_cfg.get("base_url", "https://api.goapi.io/stock/idx")
+    endpoint = _positions_cfg(config).get("bulk_endpoint", "prices")
+    headers = {goapi_cfg.get("auth_header", "X-API-KEY"): token}
+    codes = {symbol.replace(".JK", ""): symbol for symbol in symbols}
+    response = requests.get(
+        f"{base_url}/{endpoint}",
+        params={"symbols": ",".join(codes)},
+        headers=headers,
+        timeout=goapi_cfg.get("timeout", 8),
+    )
+    response.raise_for_status()
+    data = response.json().get("data") or {}
+    rows = data.get("results", []) if isinstance(data, dict) else data
+    now = pd.Timestamp.now(tz="UTC")
+    bars = {}
+    for row in rows:
+        symbol = codes.get(str(row.get("symbol", "")).upper())
+        close = row.get("close") or row.get("last_price")
+        if not symbol or close is None:
+            continue
+        price = float(close)
+        bars[symbol] = pd.DataFrame({"High": [price], "Low": [price], "Close": [price]}, index=[now])
+    return bars
+
+
+def _yfinance_bulk_bars(symbols: List[str], config: dict) -> Dict[str, pd.DataFrame]:
+    interval = _positions_cfg(config).get("quote_interval", "5m")
+    frame = cassette.call(
+        "yfinance.download",
+        (symbols, interval),
+        yf.download,
+        symbols,
+        period="1d",
+        interval=interval,
+        group_by="ticker",
+        progress=False,
+        auto_adjust=False,
+    )
+    bars = {}
+    for symbol in symbols:
+        if isinstance(frame.columns, pd.MultiIndex):
+            if symbol not in frame.columns.get_level_values(0):
+                continue
+            symbol_bars = frame[symbol]
+        else:
+            symbol_bars = frame
+        symbol_bars = symbol_bars.dropna(subset=["Close"])
+        if symbol_bars.empty:
+            continue
+        if symbol_bars.index.tz is None:
+            symbol_bars = symbol_bars.tz_localize("UTC")
+        bars[symbol] = symbol_bars
+    return bars
+
+
+def fetch_bulk_bars(symbols: List[str], config: dict) -> Dict[str, pd.DataFrame]:
+    """Bar intraday (kolom High/Low/Close, index UTC-aware) banyak simbol dalam satu request."""
+
+    if not symbols:
+        return {}
+    idx_symbols = [symbol for symbol in symbols if symbol.endswith(".JK")]
+    if idx_symbols and len(idx_symbols) == len(symbols):
+        try:
+            bars = _goapi_bulk_bars(idx_symbols, config)
+            if bars:
+                return bars
+        except requests.RequestException as exc:
+            logger.warning("Bulk quote GoAPI gagal, fallback yfinance: %s", exc)
+    try:
+        return _yfinance_bulk_bars(symbols, config)
+    except Exception as exc:  # yfinance memunculkan Exception generic
+        logger.warning("Bulk quote yfinance gagal: %s", exc)
+        return {}
+
+
+def quote_since(
+    bars: pd.DataFrame | None, since: str | None, seen: Dict[str, float] | None = None
+) -> Dict[str, Any] | None:
+    """Harga terakhir + high/low dari bar setelah `since` saja.
+
+    Bar yang dimulai tepat di `since` (bar terakhir yang sudah dievaluasi dan
+    mungkin masih berjalan saat itu) ikut dihitung; dengan `seen` (high/low bar
+    itu saat dicek) hanya ekstrem yang melewati nilai tersebut yang dipakai,
+    karena hanya itu yang terjadi setelah pengecekan. Tanpa bar baru, high/low
+    disamakan dengan harga terakhir agar bar lama (sebelum posisi/alert dibuat)
+    tidak memicu hit. `bar`/`bar_high`/`bar_low` menggambarkan bar terakhir
+    untuk disimpan sebagai titik cek berikutnya.
+    """
+
+    if bars is None or bars.empty:
+        return None
+    price = float(bars["Close"].iloc[-1])
+    quote: Dict[str, Any] = {
+        "price": price,
+        "high": price,
+        "low": price,
+        "bar": bars.index[-1].isoformat(),
+        "bar_high": float(bars["High"].iloc[-1]),
+        "bar_low": float(bars["Low"].iloc[-1]),
+    }
+    recent = bars
+    if since is not None:
+        since_ts = pd.Timestamp(since)
+        recent = bars[bars.index > since_ts]
+        current = bars[bars.index == since_ts]
+        if not current.empty:
+            if seen is None:
+                recent = pd.concat([current, recent])
+            else:
+                high, low = float(current["High"].iloc[-1]), float(current["Low"].iloc[-1])
+                if high > seen["high"]:
+                    quote["high"] = max(quote["high"], high)
+                if low < seen["low"]:
+                    quote["low"] = min(quote["low"], low)
+    if not recent.empty:
+        quote["high"] = max(quote["high"], float(recent["High"].max()))
+        quote["low"] = min(quote["low"], float(recent["Low"].min()))
+    return quote
+
+
+def fetch_bulk_quotes(symbols: List[str], config: dict, since: str | None = None) -> Dict[str, Dict[str, Any]]:
+    """Harga terakhir + high/low sejak `since` untuk banyak simbol dalam satu request."""
+
+    quotes = {}
+    for symbol, bars in fetch_bulk_bars(symbols, config).items():
+        quote = quote_since(bars, since)
+        if quote:
+            quotes[symbol] = quote
+    return quotes
+
+
+def _evaluate(position: Dict[str, Any], quote: Dict[str, float], now: datetime, config: dict) -> str | None:
+    cfg = _positions_cfg(config)
+    activation = float(cfg.get("trail_activation_atr", 1.0))
+    entry, atr, price = position["entry"], position["atr"], quote["price"]
+    # Hit dicek terhadap stop lama; trailing baru berlaku untuk siklus berikutnya.
+    # Jika TP dan stop tersentuh di periode yang sama, anggap stop lebih dulu.
+    if position["direction"] == "BUY":
+        if quote["low"] <= position["stop"]:
+            return "TRAIL STOP" if position["stop"] > position["sl"] else "SL HIT"
+        if quote["high"] >= position["tp"]:
+            return "TP HIT"
+        if atr and price >= entry + atr * activation:
+            position["stop"] = max(position["stop"], trailing_stop(entry, price, atr, "BUY"))
+    else:
+        if quote["high"] >= position["stop"]:
+            return "TRAIL STOP" if position["stop"] < position["sl"] else "SL HIT"
+        if quote["low"] <= position["tp"]:
+            return "TP HIT"
+        if atr and price <= entry - atr * activation:
+            position["stop"] = min(position["stop"], trailing_stop(entry, price, atr, "SELL"))
+    if now >= datetime.fromisoformat(position["expires_at"]):
+        return "EXPIRED"
+    return None
+
+
+def _exit_price(position: Dict[str, Any], event: str, quote: Dict[str, float]) -> float:
+    if event == "TP HIT":
+        return position["tp"]
+    if event in {"SL HIT", "TRAIL STOP"}:
+        return position["stop"]
+    return quote["price"]
+
+
+def _emit(position: Dict[str, Any], event: str, exit_price: float, config: dict) -> None:
+    sign = 1 if position["direction"] == "BUY" else -1
+    pnl_pct = sign * (exit_price - position["entry"]) / position["entry"] * 100
+    message = "\n".join(
+        [
+            f"🔔 {event} — {position['symbol']}",
+            f"Strategy : {position['strategy']}",
+            f"Entry    : {position['entry']}",
+            f"Exit     : {exit_price:.4f}",
+            f"P/L      : {pnl_pct:+.2f}%",
+        ]
+    )
+    # Posisi lama (sebelum `chat_ids` disimpan) tetap ke chat default.
+    for chat_id in position.get("chat_ids", [None]):
+        send_text(message, config, chat_id=chat_id)
+    log_signal(
+        {
+            "symbol": position["symbol"],
+            "entry": position["entry"],
+            "tp": position["tp"],
+            "sl": position["stop"],
+            "strategy": f"{event} {position['strategy']}",
+            "comment": f"exit={exit_price:.4f} pnl={pnl_pct:+.2f}%",
+        },
+        config,
+    )
+
+
+def poll_positions(config: dict) -> None:
+    """Satu siklus monitoring: satu bulk quote untuk seluruh posisi terbuka."""
+
+    with _LOCK:
+        positions = _load(config)["positions"]
+    if not positions:
+        return
+    # Request jaringan di luar lock agar open_positions dari sink tidak tertahan.
+    bars = fetch_bulk_bars(sorted({p["symbol"] for p in positions}), config)
+    snapshot_ids = {p["id"] for p in positions}
+
+    now = datetime.now(timezone.utc)
+    events = []
+    with _LOCK:
+        state = _load(config)
+        remaining = []
+        for position in state["positions"]:
+            if position["id"] not in snapshot_ids:
+                # Dibuka saat quote sedang diambil; dievaluasi siklus berikutnya.
+                remaining.append(position)
+                continue
+            # Hanya harga setelah posisi dibuka/dicek terakhir yang boleh memicu hit.
+            quote = quote_since(
+                bars.get(position["symbol"]),
+                position.get("checked_at") or position["opened_at"],
+                position.get("checked_bar"),
+            )
+            event = _evaluate(position, quote, now, config) if quote else None
+            if event is None and not quote and now >= datetime.fromisoformat(position["expires_at"]):
+                event = "EXPIRED"
+            if event is None:
+                if quote:
+                    # Titik cek = bar terakhir dari quote (bukan jam dinding), agar bar yang
+                    # masih berjalan dicek lagi di siklus berikutnya.
+                    position["checked_at"] = quote["bar"]
+                    position["checked_bar"] = {"high": quote["bar_high"], "low": quote["bar_low"]}
+                remaining.append(position)
+                continue
+            exit_price = _exit_price(position, event, quote) if quote else position["entry"]
+            events.append((position, event, exit_price))
+        state["positions"] = remaining
+        state["last_poll"] = now.isoformat()
+        _save(state, config)
+    for position, event, exit_price in events:
+        _emit(position, event, exit_price, config)
+    logger.info("Monitoring posisi: %d terbuka, %d ditutup.", len(remaining), len(events))
@@ -0,0 +1,371 @@
+"""Profiling opt-in untuk job dan proses per simbol.
+
+Aktif bila env `PROFILE_JOBS` bernilai true, flag CLI `--profile`, atau
+`profiling.enabled` di config. Section job mengambil sampel stack semua thread
+(akar stack = nama grup thread, mis. stage pipeline `fetch`) dalam format
+folded, siap untuk flamegraph.pl / speedscope, dan juga dipecah per stage.
+Section terluar juga memakai cProfile dan tracemalloc. Di Python < 3.12 fungsi
+stage yang dibungkus `profile_stage` mendapat cProfile per thread worker; sejak
+3.12 cProfile memakai `sys.monitoring` yang global (satu profiler aktif per
+interpreter), sehingga `*.prof` job sudah mencakup semua thread dan rincian
+per stage berasal dari sampel. `SymbolProfile` mengikuti satu simbol
+melintasi thread stage dari fetch sampai chart dengan menandai thread di
+sampler job (tanpa sampler tambahan). File hanya ditulis ke
+`profiling.output_dir` bila durasi section melewati threshold-nya.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import functools
+import logging
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OUTPUT_DIR = "data/profiles"
+DEFAULT_THRESHOLDS = {"job": 60.0, "symbol": 10.0}
+
+_ACTIVE_LOCK = threading.Lock()
+_ACTIVE: Dict[str, Any] = {"cprofile": False, "threads": None, "sampler": None}
+# cProfile >= 3.12 berbasis sys.monitoring: enable() kedua gagal selama profiler job aktif.
+_PER_THREAD_CPROFILE = sys.version_info < (3, 12)
+# thread id -> (SymbolProfile, nama stage) yang sedang dikerjakan thread itu.
+_THREAD_TAGS: Dict[int, tuple["_TaggedSamples", str]] = {}
+
+
+def _env_truthy(value: str | None) -> bool:
+    return bool(value) and value.strip().lower() in {"1", "true", "yes", "y", "on"}
+
+
+def is_enabled(config: dict | None) -> bool:
+    return _env_truthy(os.getenv("PROFILE_JOBS")) or bool((config or {}).get("profiling", {}).get("enabled"))
+
+
+def _thread_group(name: str) -> str:
+    """`fetch-3` -> `fetch`: worker satu stage digabung dalam satu grup."""
+
+    return re.sub(r"[-_]\d+$", "", name) or name
+
+
+class _StackSampler(threading.Thread):
+    """Ambil stack semua thread (kecuali sampler) secara berkala dan hitung per stack (folded).
+
+    Akar stack diberi nama grup thread-nya. Thread yang ditandai di
+    `_THREAD_TAGS` juga dicatat ke kolektor tag itu, sehingga section per
+    simbol tidak perlu sampler sendiri.
+    """
+
+    def __init__(self, interval: float) -> None:
+        super().__init__(name="profiling-sampler", daemon=True)
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                name = names.get(thread_id, str(thread_id))
+                if thread_id == self.ident or name == self.name:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{Path(code.co_filename).name}:{code.co_name}")
+                    frame = frame.f_back
+                if not stack:
+                    continue
+                folded = ";".join(reversed(stack))
+                self.samples[f"{_thread_group(name)};{folded}"] += 1
+                tag = _THREAD_TAGS.get(thread_id)
+                if tag is not None:
+                    tag[0].add_sample(f"{tag[1]};{folded}")
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+
+class _TaggedSamples:
+    """Kolektor sampel untuk thread yang ditandai di sampler job."""
+
+    def __init__(self) -> None:
+        self.samples: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def add_sample(self, stack: str) -> None:
+        with self._lock:
+            self.samples[stack] += 1
+
+    @contextmanager
+    def tagged(self, label: str) -> Iterator[None]:
+        thread_id = threading.get_ident()
+        previous = _THREAD_TAGS.get(thread_id)
+        _THREAD_TAGS[thread_id] = (self, label)
+        try:
+            yield
+        finally:
+            if previous is None:
+                _THREAD_TAGS.pop(thread_id, None)
+            else:
+                _THREAD_TAGS[thread_id] = previous
+
+
+class _ThreadProfiles:
+    """cProfile per thread worker, dikumpulkan oleh section job yang aktif."""
+
+    def __init__(self) -> None:
+        self.profiles: Dict[int, tuple[str, cProfile.Profile]] = {}
+        self._lock = threading.Lock()
+
+    def current(self) -> cProfile.Profile:
+        thread = threading.current_thread()
+        with self._lock:
+            if thread.ident not in self.profiles:
+                self.profiles[thread.ident] = (thread.name, cProfile.Profile())
+            return self.profiles[thread.ident][1]
+
+    def by_group(self) -> Dict[str, pstats.Stats]:
+        grouped: Dict[str, pstats.Stats] = {}
+        with self._lock:
+            profiles = list(self.profiles.values())
+        for name, profiler in profiles:
+            group = _thread_group(name)
+            try:
+                if group in grouped:
+                    grouped[group].add(profiler)
+                else:
+                    grouped[group] = pstats.Stats(profiler)
+            except TypeError:  # thread tanpa satu pun call yang tercatat
+                continue
+        return grouped
+
+
+def profile_stage(func: Callable[..., Any]) -> Callable[..., Any]:
+    """Bungkus fungsi stage agar tiap thread worker punya cProfile sendiri selama section job aktif."""
+
+    @functools.wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        profiles = _ACTIVE["threads"]
+        if profiles is None:
+            return func(*args, **kwargs)
+        profiler = profiles.current()
+        try:
+            profiler.enable()
+        except ValueError:
+            return func(*args, **kwargs)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.disable()
+
+    return wrapper
+
+
+def _claim_cprofile() -> bool:
+    with _ACTIVE_LOCK:
+        if _ACTIVE["cprofile"]:
+            return False
+        _ACTIVE["cprofile"] = True
+        return True
+
+
+def _release_cprofile() -> None:
+    with _ACTIVE_LOCK:
+        _ACTIVE["cprofile"] = False
+        _ACTIVE["threads"] = None
+
+
+def _safe_name(name: str) -> str:
+    return "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in name)
+
+
+def _section_cfg(config: dict | None, kind: str) -> tuple[dict, float]:
+    cfg = (config or {}).get("profiling", {})
+    threshold = float(cfg.get("thresholds", {}).get(kind, DEFAULT_THRESHOLDS.get(kind, 0.0)))
+    return cfg, threshold
+
+
+@contextmanager
+def profile_section(name: str, config: dict | None, kind: str = "job") -> Iterator[None]:
+    """Profil blok kode `name` beserta thread yang berjalan selama blok; tanpa overhead bila nonaktif."""
+
+    if not is_enabled(config):
+        yield
+        return
+
+    cfg, threshold = _section_cfg(config, kind)
+    # Satu sampler per proses: section bersarang hanya menandai thread pemanggil.
+    with _ACTIVE_LOCK:
+        sampler = _ACTIVE["sampler"]
+        owns_sampler = sampler is None
+        if owns_sampler:
+            sampler = _ACTIVE["sampler"] = _StackSampler(float(cfg.get("sample_interval", 0.01)))
+    collector = None if owns_sampler else _TaggedSamples()
+    profiler = None
+    thread_profiles = None
+    started_tracemalloc = False
+    if _claim_cprofile():
+        if cfg.get("cprofile", True):
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:  # profiler lain sedang aktif (mis. debugger)
+                profiler = None
+            else:
+                if _PER_THREAD_CPROFILE:
+                    thread_profiles = _ThreadProfiles()
+                    _ACTIVE["threads"] = thread_profiles
+        if cfg.get("tracemalloc", True) and not tracemalloc.is_tracing():
+            tracemalloc.start(int(cfg.get("tracemalloc_frames", 10)))
+            started_tracemalloc = True
+        owns_cprofile = True
+    else:
+        owns_cprofile = False
+
+    if owns_sampler:
+        sampler.start()
+    started = time.perf_counter()
+    try:
+        if collector is None:
+            yield
+        else:
+            with collector.tagged(_thread_group(threading.current_thread().name)):
+                yield
+    finally:
+        duration = time.perf_counter() - started
+        if owns_sampler:
+            sampler.stop()
+            with _ACTIVE_LOCK:
+                _ACTIVE["sampler"] = None
+        if profiler is not None:
+            profiler.disable()
+        snapshot = tracemalloc.take_snapshot() if started_tracemalloc else None
+        if started_tracemalloc:
+            tracemalloc.stop()
+        if owns_cprofile:
+            _release_cprofile()
+        if duration >= threshold:
+            _write_report(
+                name,
+                duration,
+                sampler.samples if collector is None else collector.samples,
+                cfg,
+                profiler=profiler,
+                thread_stats=thread_profiles.by_group() if thread_profiles is not None else None,
+                snapshot=snapshot,
+                split_groups=owns_sampler,
+            )
+
+
+class SymbolProfile(_TaggedSamples):
+    """Section satu simbol yang melintasi thread stage pipeline (fetch s/d chart).
+
+    Setiap `stage()` menandai thread yang sedang mengerjakan simbol ini agar
+    sampler job ikut mencatat stack-nya ke profil simbol, dan mencatat durasi
+    stage. Satu simbol bercabang menjadi beberapa sinyal setelah strategi
+    (`expect`); laporan ditulis saat cabang terakhir selesai di stage `final`
+    atau gagal, bila durasi total melewati threshold.
+    """
+
+    def __init__(self, name: str, config: dict | None, kind: str = "symbol") -> None:
+        self.name = name
+        self.enabled = is_enabled(config)
+        self.cfg, self.threshold = _section_cfg(config, kind)
+        super().__init__()
+        self.stages: Counter = Counter()
+        self.started = time.perf_counter()
+        self._pending = 1
+
+    @contextmanager
+    def stage(self, stage_name: str, final: bool = False) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        failed = False
+        try:
+            with self.tagged(stage_name):
+                yield
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            with self._lock:
+                self.stages[stage_name] += time.perf_counter() - started
+            if final or failed:
+                self.finish()
+
+    def expect(self, branches: int) -> None:
+        """Cabang saat ini diganti `branches` cabang baru (mis. sinyal hasil strategi)."""
+
+        with self._lock:
+            self._pending += branches - 1
+            done = self._pending <= 0
+        if done:
+            self._report()
+
+    def finish(self) -> None:
+        """Tandai satu cabang selesai (sampai chart, dilewati, atau gagal)."""
+
+        self.expect(0)
+
+    def _report(self) -> None:
+        duration = time.perf_counter() - self.started
+        if self.enabled and duration >= self.threshold:
+            _write_report(self.name, duration, self.samples, self.cfg, stages=dict(self.stages))
+
+
+def _write_report(
+    name: str,
+    duration: float,
+    samples: Counter,
+    cfg: dict,
+    profiler: cProfile.Profile | None = None,
+    thread_stats: Dict[str, pstats.Stats] | None = None,
+    snapshot: tracemalloc.Snapshot | None = None,
+    stages: Dict[str, float] | None = None,
+    split_groups: bool = False,
+) -> None:
+    output_dir = Path(cfg.get("output_dir", DEFAULT_OUTPUT_DIR))
+    output_dir.mkdir(parents=True, exist_ok=True)
+    prefix = output_dir / f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}_{_safe_name(name)}"
+
+    with open(f"{prefix}.folded", "w", encoding="utf-8") as handle:
+        for stack, count in samples.most_common():
+            handle.write(f"{stack} {count}\n")
+    if split_groups:
+        # Satu file folded per grup thread (stage pipeline), akar stack = nama grup.
+        groups: Dict[str, list[tuple[str, int]]] = {}
+        for stack, count in samples.most_common():
+            groups.setdefault(stack.split(";", 1)[0], []).append((stack, count))
+        for group, stacks in groups.items():
+            with open(f"{prefix}.{_safe_name(group)}.folded", "w", encoding="utf-8") as handle:
+                for stack, count in stacks:
+                    handle.write(f"{stack} {count}\n")
+    if profiler is not None:
+        profiler.dump_stats(f"{prefix}.prof")
+    for group, stats in (thread_stats or {}).items():
+        stats.dump_stats(f"{prefix}.{_safe_name(group)}.prof")
+    if snapshot is not None:
+        top_n = int(cfg.get("tracemalloc_top", 25))
+        with open(f"{prefix}.alloc.txt", "w", encoding="utf-8") as handle:
+            for stat in snapshot.statistics("lineno")[:top_n]:
+                handle.write(f"{stat}\n")
+    if stages:
+        with open(f"{prefix}.stages.txt", "w", encoding="utf-8") as handle:
+            for stage_name, seconds in stages.items():
+                handle.write(f"{stage_name}\t{seconds:.3f}s\n")
+    logger.warning("%s lambat (%.1fs). Profil tersimpan di %s.*", name, duration, prefix)
@@ -0,0 +1,206 @@
+"""Resampling multi-timeframe lokal dari bar interval terkecil.
+
+Bar dasar (interval `data_sources.yfinance.interval`) disimpan per simbol di
+memori dan di `resample.store_dir`: bar final di-append ke `<symbol>.csv`,
+sedangkan bar terakhir yang mungkin masih berjalan ditulis ulang di file kecil
+`<symbol>.open.csv`. Timeframe lebih besar diturunkan
+secara lokal tanpa request tambahan. Bucket di-anchor ke tengah malam WIB
+sehingga 4h membagi sesi IDX menjadi sesi pagi (08-12) dan siang (12-16),
+dan 1d mengikuti tanggal bursa. Bucket kosong (istirahat siang, malam) dibuang.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+IDX_TIMEZONE = "Asia/Jakarta"
+
+TIMEFRAMES = {
+    "1m": "1min",
+    "5m": "5min",
+    "15m": "15min",
+    "30m": "30min",
+    "1h": "1h",
+    "60m": "1h",
+    "4h": "4h",
+    "1d": "1D",
+}
+_AGG = {"open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"}
+_COLUMNS = ["timestamp", *_AGG]
+
+_BASE: Dict[str, pd.DataFrame] = {}
+_DERIVED: Dict[Tuple[str, str], pd.DataFrame] = {}
+# Jumlah baris yang di-append ke CSV sejak terakhir ditulis penuh (untuk pemadatan).
+_APPENDED: Dict[str, int] = {}
+_LOCK = threading.Lock()
+
+
+def _resample_cfg(config: dict) -> dict[str, Any]:
+    return config.get("resample", {})
+
+
+def _store_path(symbol: str, config: dict) -> Path | None:
+    store_dir = _resample_cfg(config).get("store_dir")
+    if not store_dir:
+        return None
+    return Path(store_dir) / f"{symbol}.csv"
+
+
+def _open_bar_path(path: Path) -> Path:
+    return path.with_name(f"{path.stem}.open.csv")
+
+
+def _to_frame(records: list[dict[str, Any]]) -> pd.DataFrame:
+    df = pd.DataFrame(records)
+    if not set(_COLUMNS).issubset(df.columns):
+        return pd.DataFrame(columns=_AGG.keys())
+    timestamps = pd.to_datetime(df["timestamp"])
+    if timestamps.dt.tz is not None:
+        timestamps = timestamps.dt.tz_convert(IDX_TIMEZONE).dt.tz_localize(None)
+    df["timestamp"] = timestamps
+    return df[_COLUMNS].set_index("timestamp").sort_index()
+
+
+def _load_base(symbol: str, config: dict) -> pd.DataFrame:
+    base = _BASE.get(symbol)
+    if base is not None:
+        return base
+    path = _store_path(symbol, config)
+    frames = [
+        pd.read_csv(part, parse_dates=["timestamp"], index_col="timestamp")
+        for part in ((path, _open_bar_path(path)) if path else ())
+        if part.exists()
+    ]
+    if frames:
+        base = pd.concat(frames)
+        # Baris yang di-append belakangan (bar final terbaru) menang atas salinan lama.
+        base = base[~base.index.duplicated(keep="last")].sort_index()
+        base = base.tail(int(_resample_cfg(config).get("max_bars", 5000)))
+    else:
+        base = pd.DataFrame(columns=_AGG.keys())
+    _BASE[symbol] = base
+    return base
+
+
+def _persist(symbol: str, merged: pd.DataFrame, previous_last: pd.Timestamp | None, config: dict) -> None:
+    """Append bar yang baru final dan tulis ulang hanya file bar terakhir."""
+
+    path = _store_path(symbol, config)
+    if not path:
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    finalized = merged.iloc[:-1]
+    fresh = finalized if previous_last is None else finalized[finalized.index >= previous_last]
+    appended = _APPENDED.get(symbol, 0) + len(fresh)
+    max_bars = int(_resample_cfg(config).get("max_bars", 5000))
+    if not path.exists() or appended > max_bars:
+        # Padatkan sesekali agar file tidak tumbuh melewati `max_bars` tanpa batas.
+        finalized.to_csv(path, index_label="timestamp")
+        appended = 0
+    elif not fresh.empty:
+        fresh.to_csv(path, mode="a", header=False)
+    _APPENDED[symbol] = appended
+    merged.iloc[-1:].to_csv(_open_bar_path(path), index_label="timestamp")
+
+
+def _aggregate(bars: pd.DataFrame, rule: str) -> pd.DataFrame:
+    # Bar harian dikelompokkan per tanggal; origin hanya relevan untuk intraday.
+    anchor = {} if rule == "1D" else {"origin": "epoch"}
+    derived = bars.resample(rule, label="left", closed="left", **anchor).agg(_AGG)
+    return derived.dropna(subset=["open"])
+
+
+def update_bars(symbol: str, history: list[dict[str, Any]], config: dict) -> pd.Timestamp | None:
+    """Gabungkan bar baru ke store. Mengembalikan timestamp bar paling awal yang berubah."""
+
+    base = _load_base(symbol, config)
+    incoming = _to_frame(history)
+    if not base.empty and not incoming.empty:
+        # Bar sebelum bar terakhir store sudah final; bar terakhir bisa masih berjalan.
+        incoming = incoming[incoming.index >= base.index[-1]]
+        # Bar yang sama persis dengan store tidak dihitung sebagai perubahan.
+        overlap = incoming.index.intersection(base.index)
+        same = np.isclose(
+            incoming.loc[overlap, list(_AGG)].to_numpy(dtype=float),
+            base.loc[overlap, list(_AGG)].to_numpy(dtype=float),
+            equal_nan=True,
+        ).all(axis=1)
+        incoming = incoming.drop(overlap[same])
+    if incoming.empty:
+        return None
+
+    max_bars = int(_resample_cfg(config).get("max_bars", 5000))
+    merged = incoming if base.empty else pd.concat([base, incoming])
+    merged = merged[~merged.index.duplicated(keep="last")].sort_index().tail(max_bars)
+    _BASE[symbol] = merged
+    _persist(symbol, merged, None if base.empty else base.index[-1], config)
+    return incoming.index[0]
+
+
+def _refresh_derived(symbol: str, timeframe: str, rule: str, changed_from: pd.Timestamp | None) -> pd.DataFrame:
+    base = _BASE[symbol]
+    derived = _DERIVED.get((symbol, timeframe))
+    if derived is None or derived.empty:
+        derived = _aggregate(base, rule)
+    elif changed_from is not None:
+        # Hanya bucket yang tersentuh bar baru yang dihitung ulang.
+        bucket_start = changed_from.floor(rule)
+        kept = derived[derived.index < bucket_start]
+        fresh = _aggregate(base[base.index >= bucket_start], rule)
+        derived = pd.concat([kept, fresh])
+        derived = derived[derived.index >= base.index[0].floor(rule)]
+    _DERIVED[(symbol, timeframe)] = derived
+    return derived
+
+
+def _to_records(bars: pd.DataFrame) -> list[dict[str, Any]]:
+    return [
+        {
+            "timestamp": ts.isoformat(),
+            "open": float(row.open),
+            "high": float(row.high),
+            "low": float(row.low),
+            "close": float(row.close),
+            "volume": float(row.volume),
+        }
+        for ts, row in zip(bars.index, bars.itertuples(index=False))
+    ]
+
+
+def get_timeframe(data: dict[str, Any], timeframe: str, config: dict) -> list[dict[str, Any]]:
+    """History `data` dalam `timeframe` (15m, 1h, 4h, 1d, ...) tanpa request jaringan."""
+
+    rule = TIMEFRAMES.get(timeframe.lower())
+    history = data.get("history") or []
+    symbol = data.get("symbol")
+    if not rule or not symbol:
+        logger.warning("Timeframe %s tidak didukung untuk %s. Memakai history asli.", timeframe, symbol)
+        return history
+
+    base_interval = config.get("data_sources", {}).get("yfinance", {}).get("interval", "1h")
+    base_rule = TIMEFRAMES.get(str(base_interval).lower())
+    if base_rule and pd.Timedelta(rule) < pd.Timedelta(base_rule):
+        logger.warning(
+            "Timeframe %s lebih kecil dari data_sources.yfinance.interval %s. Memakai history asli.",
+            timeframe,
+            base_interval,
+        )
+        return history
+
+    window = int(_resample_cfg(config).get("history_window", 160))
+    with _LOCK:
+        changed_from = update_bars(symbol, history, config)
+        if _BASE[symbol].empty:
+            return history
+        if base_rule == rule:
+            return _to_records(_BASE[symbol].tail(window))
+        derived = _refresh_derived(symbol, timeframe.lower(), rule, changed_from)
+        return _to_records(derived.tail(window))
@@ -0,0 +1,149 @@
+"""Health tracking & circuit breaker per sumber data (yfinance, GoAPI, ...).
+
+Setiap sumber mencatat kegagalan beruntun dan latensi rata-rata. Setelah
+`failure_threshold` kegagalan beruntun, breaker terbuka sehingga sumber
+dilewati tanpa menunggu timeout. Pemulihan dicek oleh probe di background
+thread dengan backoff, bukan oleh request simbol yang sedang berjalan. Probe
+yang berhasil hanya membawa breaker ke `half_open`: request biasa kembali
+diizinkan dan breaker baru tertutup setelah `half_open_successes` sukses
+beruntun; satu kegagalan di `half_open` membuka breaker lagi dengan cooldown
+dua kali lipat.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SourceHealth:
+    name: str
+    state: str = "closed"
+    consecutive_failures: int = 0
+    half_open_successes: int = 0
+    total_failures: int = 0
+    total_successes: int = 0
+    latency_avg: float | None = None
+    opened_at: float | None = None
+    cooldown: float = 0.0
+    last_error: str | None = None
+
+
+_HEALTH: Dict[str, SourceHealth] = {}
+_LOCK = threading.Lock()
+
+
+def _get(name: str) -> SourceHealth:
+    health = _HEALTH.get(name)
+    if health is None:
+        health = _HEALTH[name] = SourceHealth(name)
+    return health
+
+
+def allow(name: str) -> bool:
+    """True jika sumber boleh dipanggil (breaker tertutup atau half-open)."""
+
+    with _LOCK:
+        return _get(name).state != "open"
+
+
+def record_success(name: str, latency: float, breaker_cfg: dict[str, Any] | None = None) -> None:
+    required = int((breaker_cfg or {}).get("half_open_successes", 3))
+    closed = False
+    with _LOCK:
+        health = _get(name)
+        health.consecutive_failures = 0
+        health.total_successes += 1
+        if health.latency_avg is None:
+            health.latency_avg = latency
+        else:
+            health.latency_avg = 0.8 * health.latency_avg + 0.2 * latency
+        if health.state == "half_open":
+            health.half_open_successes += 1
+            if health.half_open_successes >= required:
+                health.state = "closed"
+                health.opened_at = None
+                closed = True
+    if closed:
+        logger.info("Sumber %s pulih, circuit breaker ditutup.", name)
+
+
+def record_failure(
+    name: str,
+    exc: Exception,
+    probe: Callable[[], Any],
+    breaker_cfg: dict[str, Any],
+) -> None:
+    threshold = int(breaker_cfg.get("failure_threshold", 3))
+    cooldown = float(breaker_cfg.get("cooldown", 60))
+    max_cooldown = float(breaker_cfg.get("max_cooldown", 900))
+    with _LOCK:
+        health = _get(name)
+        health.consecutive_failures += 1
+        health.total_failures += 1
+        health.last_error = str(exc)
+        if health.state == "half_open":
+            health.cooldown = min(health.cooldown * 2, max_cooldown)
+        elif health.state == "open" or health.consecutive_failures < threshold:
+            return
+        else:
+            health.cooldown = cooldown
+        reopened = health.state == "half_open"
+        health.state = "open"
+        health.opened_at = time.time()
+    if reopened:
+        logger.warning("Circuit breaker %s terbuka lagi dari half-open: %s", name, exc)
+    else:
+        logger.warning("Circuit breaker %s terbuka setelah %d kegagalan: %s", name, threshold, exc)
+    _schedule_probe(name, probe, breaker_cfg)
+
+
+def _schedule_probe(name: str, probe: Callable[[], Any], breaker_cfg: dict[str, Any]) -> None:
+    with _LOCK:
+        delay = _get(name).cooldown
+    timer = threading.Timer(delay, _run_probe, args=(name, probe, breaker_cfg))
+    timer.daemon = True
+    timer.start()
+
+
+def _run_probe(name: str, probe: Callable[[], Any], breaker_cfg: dict[str, Any]) -> None:
+    started = time.monotonic()
+    try:
+        probe()
+    except Exception as exc:
+        max_cooldown = float(breaker_cfg.get("max_cooldown", 900))
+        with _LOCK:
+            health = _get(name)
+            health.last_error = str(exc)
+            health.cooldown = min(health.cooldown * 2, max_cooldown)
+        logger.info("Probe %s masih gagal (%s). Coba lagi dalam %.0fs.", name, exc, health.cooldown)
+        _schedule_probe(name, probe, breaker_cfg)
+        return
+    with _LOCK:
+        health = _get(name)
+        health.state = "half_open"
+        health.consecutive_failures = 0
+        health.half_open_successes = 0
+    logger.info("Probe %s berhasil, circuit breaker half-open.", name)
+    record_success(name, time.monotonic() - started, breaker_cfg)
+
+
+def snapshot() -> Dict[str, Dict[str, Any]]:
+    with _LOCK:
+        return {
+            name: {
+                "state": health.state,
+                "consecutive_failures": health.consecutive_failures,
+                "total_failures": health.total_failures,
+                "total_successes": health.total_successes,
+                "latency_avg": health.latency_avg,
+                "last_error": health.last_error,
+            }
+            for name, health in _HEALTH.items()
+        }
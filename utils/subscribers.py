@@ -0,0 +1,98 @@
+"""Model langganan multi-chat Telegram.
+
+Setiap entri `subscribers` di config punya `chat_id`, `styles`, `watchlist`,
+`strategies`, dan `digest` sendiri. Job hanya menghitung gabungan simbol dan
+strategi seluruh subscriber yang aktif untuk style tersebut (sekali per
+simbol), lalu sinyal dibagikan ke setiap chat yang berminat. Tanpa entri
+`subscribers`, bot berperilaku seperti sebelumnya: satu chat default
+(`TELEGRAM_CHAT_ID`) dengan watchlist job dan semua strategi.
+"""
+
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, List
+
+from utils.watchlist import generate_watchlist
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Subscriber:
+    name: str
+    chat_id: str | None
+    symbols: FrozenSet[str]
+    strategies: FrozenSet[str] | None
+    digest: bool
+
+    def wants(self, signal: Dict[str, Any]) -> bool:
+        if signal.get("symbol") not in self.symbols:
+            return False
+        return self.strategies is None or signal.get("strategy_id") in self.strategies
+
+
+def _as_list(value: Any) -> List[str]:
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return [str(item) for item in value]
+
+
+def _symbols_for(entry: dict, config: dict, default_watchlist: List[str]) -> List[str]:
+    manual = _as_list(entry.get("watchlist"))
+    if not manual:
+        return default_watchlist
+    # Watchlist subscriber tidak dibatasi `watchlist.limit` milik job.
+    return generate_watchlist({**config, "watchlist": {"manual": manual}})
+
+
+def subscribers_for(style: str, config: dict, default_watchlist: List[str] | None = None) -> List[Subscriber]:
+    """Subscriber yang aktif untuk `style`, dengan watchlist yang sudah di-resolve."""
+
+    if default_watchlist is None:
+        default_watchlist = generate_watchlist(config)
+    default_digest = bool(config.get("telegram", {}).get("digest", False))
+    entries = config.get("subscribers") or []
+    if not entries:
+        return [Subscriber("default", None, frozenset(default_watchlist), None, default_digest)]
+
+    subscribers = []
+    for index, entry in enumerate(entries):
+        chat_id = entry.get("chat_id")
+        if not chat_id:
+            logger.warning("Subscriber #%d tanpa chat_id dilewati.", index)
+            continue
+        styles = {item.upper() for item in _as_list(entry.get("styles") or entry.get("style"))}
+        if styles and style.upper() not in styles:
+            continue
+        strategies = _as_list(entry.get("strategies"))
+        subscribers.append(
+            Subscriber(
+                name=str(entry.get("name") or chat_id),
+                chat_id=str(chat_id),
+                symbols=frozenset(_symbols_for(entry, config, default_watchlist)),
+                strategies=frozenset(strategies) if strategies else None,
+                digest=bool(entry.get("digest", default_digest)),
+            )
+        )
+    return subscribers
+
+
+def job_plan(subscribers: List[Subscriber], config: dict) -> tuple[List[str], List[str]]:
+    """Gabungan simbol dan strategi yang perlu dihitung untuk seluruh subscriber."""
+
+    symbols = sorted(set().union(*(sub.symbols for sub in subscribers))) if subscribers else []
+    configured = list(config.get("strategies", []))
+    if any(sub.strategies is None for sub in subscribers):
+        return symbols, configured
+    wanted = set().union(*(sub.strategies for sub in subscribers)) if subscribers else set()
+    strategies = [name for name in configured if name in wanted]
+    strategies += sorted(wanted - set(configured))
+    return symbols, strategies
+
+
+def recipients(signal: Dict[str, Any], subscribers: List[Subscriber]) -> List[Subscriber]:
+    return [sub for sub in subscribers if sub.wants(signal)]
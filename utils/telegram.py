@@ -2,15 +2,22 @@
 
 from __future__ import annotations
 
+import html
+import json
 import logging
 import os
+from contextlib import ExitStack
+from pathlib import Path
 from textwrap import dedent
-from typing import Any, Dict
+from typing import Any, Dict, List
 
 import requests
 
 logger = logging.getLogger(__name__)
 
+MESSAGE_LIMIT = 4096
+MEDIA_GROUP_LIMIT = 10
+
 
 def _format_message(signal: Dict[str, Any]) -> str:
     lines = [
@@ -37,6 +44,12 @@ def _format_message(signal: Dict[str, Any]) -> str:
     lines.append(f"Antri  : {antri if antri else '-'}")
     lines.append(f"TP     : {signal.get('tp')}")
     lines.append(f"SL     : {signal.get('sl')}")
+    risk = signal.get("risk")
+    if risk:
+        size = f"{risk['lots']} lot" if risk.get("lots") is not None else f"{risk['shares']} sh"
+        lines.append(f"Size   : {size} (stop ATR {risk['stop']})")
+        if risk.get("correlated_with"):
+            lines.append(f"Korelasi : {risk['correlation']:.2f} dgn {risk['correlated_with']}")
     if price:
         lines.append(f"Last Price : {price}")
     if signal.get("chart_path"):
@@ -61,10 +74,10 @@ def _get_chat_id(telegram_cfg: dict) -> str | None:
 
 
 
-def send_signal(signal: Dict[str, Any], config: dict) -> None:
+def send_signal(signal: Dict[str, Any], config: dict, chat_id: str | None = None) -> None:
     telegram_cfg = config.get("telegram", {})
     token = _get_token(telegram_cfg)
-    chat_id = _get_chat_id(telegram_cfg)
+    chat_id = chat_id or _get_chat_id(telegram_cfg)
 
     if not token or not chat_id:
         logger.warning("Telegram token/chat_id belum dikonfigurasi. Lewati pengiriman.")
@@ -80,6 +93,132 @@ def send_signal(signal: Dict[str, Any], config: dict) -> None:
         logger.error("Gagal mengirim sinyal Telegram: %s", exc)
 
 
+def send_text(message: str, config: dict, chat_id: str | None = None) -> None:
+    """Kirim pesan teks bebas (event posisi, alert) ke `chat_id` atau chat default."""
+    telegram_cfg = config.get("telegram", {})
+    token = _get_token(telegram_cfg)
+    chat_id = chat_id or _get_chat_id(telegram_cfg)
+    if not token or not chat_id:
+        logger.warning("Telegram token/chat_id belum dikonfigurasi. Lewati pengiriman.")
+        return
+    url = f"https://api.telegram.org/bot{token}/sendMessage"
+    try:
+        response = requests.post(url, json={"chat_id": chat_id, "text": message}, timeout=10)
+        response.raise_for_status()
+    except requests.RequestException as exc:
+        logger.error("Gagal mengirim pesan Telegram: %s", exc)
+
+
+def _digest_rows(signals: List[Dict[str, Any]]) -> List[str]:
+    header = f"{'Symbol':<9} {'Strategy':<22} {'Entry':>10} {'TP':>10} {'SL':>10}"
+    rows = [header, "-" * len(header)]
+    for signal in signals:
+        rows.append(
+            f"{str(signal.get('symbol', '-')):<9} {str(signal.get('strategy', '-'))[:22]:<22} "
+            f"{signal.get('entry', '-'):>10} {signal.get('tp', '-'):>10} {signal.get('sl', '-'):>10}"
+        )
+    return rows
+
+
+def _split_message(title: str, rows: List[str]) -> List[str]:
+    """Pecah tabel menjadi beberapa pesan <pre> yang masing-masing <= MESSAGE_LIMIT.
+
+    Dua baris pertama (header tabel) diulang di setiap potongan.
+    """
+    header = [html.escape(row) for row in rows[:2]]
+    overhead = len("<pre></pre>\n") + len(html.escape(title)) + sum(len(row) + 1 for row in header)
+    chunks: List[List[str]] = []
+    current: List[str] = []
+    size = overhead
+    for row in rows[2:]:
+        line = html.escape(row)
+        if current and size + len(line) + 1 > MESSAGE_LIMIT:
+            chunks.append(current)
+            current, size = [], overhead
+        current.append(line[: MESSAGE_LIMIT - overhead])
+        size += len(line) + 1
+    if current:
+        chunks.append(current)
+    return [f"{html.escape(title)}\n<pre>" + "\n".join(header + chunk) + "</pre>" for chunk in chunks]
+
+
+def _send_media_group(token: str, chat_id: str, signals: List[Dict[str, Any]]) -> None:
+    charts = [s for s in signals if s.get("chart_path") and Path(s["chart_path"]).exists()]
+    url = f"https://api.telegram.org/bot{token}/sendMediaGroup"
+    for start in range(0, len(charts), MEDIA_GROUP_LIMIT):
+        batch = charts[start:start + MEDIA_GROUP_LIMIT]
+        if len(batch) == 1:
+            # sendMediaGroup butuh minimal dua item; satu chart dikirim sebagai foto biasa.
+            _send_photo(token, chat_id, batch[0])
+            continue
+        media = [
+            {"type": "photo", "media": f"attach://chart{idx}", "caption": f"{s.get('symbol')} {s.get('strategy')}"}
+            for idx, s in enumerate(batch)
+        ]
+        try:
+            with ExitStack() as stack:
+                files = {
+                    f"chart{idx}": stack.enter_context(open(s["chart_path"], "rb"))
+                    for idx, s in enumerate(batch)
+                }
+                response = requests.post(
+                    url,
+                    data={"chat_id": chat_id, "media": json.dumps(media)},
+                    files=files,
+                    timeout=30,
+                )
+            response.raise_for_status()
+        except requests.RequestException as exc:
+            logger.error("Gagal mengirim media group Telegram: %s", exc)
+
+
+def _send_photo(token: str, chat_id: str, signal: Dict[str, Any]) -> None:
+    url = f"https://api.telegram.org/bot{token}/sendPhoto"
+    try:
+        with open(signal["chart_path"], "rb") as handle:
+            response = requests.post(
+                url,
+                data={"chat_id": chat_id, "caption": f"{signal.get('symbol')} {signal.get('strategy')}"},
+                files={"photo": handle},
+                timeout=30,
+            )
+        response.raise_for_status()
+    except requests.RequestException as exc:
+        logger.error("Gagal mengirim chart Telegram: %s", exc)
+
+
+def send_digest(
+    signals: List[Dict[str, Any]],
+    config: dict,
+    title: str = "Ringkasan sinyal",
+    chat_id: str | None = None,
+) -> None:
+    """Kirim seluruh sinyal satu job sebagai satu tabel + satu media group chart."""
+    if not signals:
+        return
+    telegram_cfg = config.get("telegram", {})
+    token = _get_token(telegram_cfg)
+    chat_id = chat_id or _get_chat_id(telegram_cfg)
+
+    if not token or not chat_id:
+        logger.warning("Telegram token/chat_id belum dikonfigurasi. Lewati pengiriman.")
+        return
+
+    url = f"https://api.telegram.org/bot{token}/sendMessage"
+    for message in _split_message(f"📊 {title} ({len(signals)} sinyal)", _digest_rows(signals)):
+        try:
+            response = requests.post(
+                url,
+                json={"chat_id": chat_id, "text": message, "parse_mode": "HTML"},
+                timeout=10,
+            )
+            response.raise_for_status()
+        except requests.RequestException as exc:
+            logger.error("Gagal mengirim digest Telegram: %s", exc)
+    _send_media_group(token, chat_id, signals)
+    logger.info("Digest %d sinyal terkirim ke Telegram.", len(signals))
+
+
 # Fungsi notifikasi startup/deploy
 
 def send_startup_message(config: dict) -> None: